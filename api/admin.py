@@ -1,11 +1,23 @@
-from django.contrib import admin
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
 from django.db.models import Count, Q
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import format_html
 
-from api.models import (CustomUser, Company, JobPost, Skill, City, JobApplication)
+from api.admin_scaling import ScalableAdminMixin, RelatedAutocompleteFilter
+from api.applications import transition_applications, decline_remaining_applicants
+from api.choices import JobApplicationStatus
+from api.dedup import merge_duplicates
+from api.models import (CustomUser, Company, JobPost, Skill, City, JobApplication, SavedSearch, HiringStat)
+from api.rollups import DAY, ceil_day, series, summarize
+
+from strings import APPLICATIONS_TRANSITIONED, APPLICATIONS_SKIPPED, JOB_POST_DUPLICATE, JOB_POSTS_MERGED
 
 admin.site.site_header = 'Rozgaar Dhundo: Online Job Portal'
 admin.site.site_url = None
@@ -13,21 +25,30 @@ admin.site.site_url = None
 admin.site.unregister(Group)
 
 
+def report_transition(model_admin, request, result, status_label):
+    model_admin.message_user(request, APPLICATIONS_TRANSITIONED.format(updated=result.updated, status=status_label))
+    if result.skipped:
+        model_admin.message_user(request, APPLICATIONS_SKIPPED.format(skipped=result.skipped, status=status_label),
+                                 level=messages.WARNING)
+
+
 @admin.register(Skill)
 class SkillAdmin(admin.ModelAdmin):
     list_display = ('name',)
+    search_fields = ['^name', ]
 
 
 @admin.register(City)
 class CityAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'latitude', 'longitude')
+    search_fields = ['^name', ]
 
 
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
     list_display = ('name', 'get_logo', 'email', 'mobile_number',
                     'get_total_jobs_posted', 'get_total_active_jobs')
-    search_fields = ['name', ]
+    search_fields = ['^name', ]
     readonly_fields = ['get_logo', ]
 
     def get_queryset(self, request):
@@ -59,21 +80,114 @@ class CompanyAdmin(admin.ModelAdmin):
 
 
 @admin.register(JobPost)
-class JobPostAdmin(admin.ModelAdmin):
+class JobPostAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'company', 'total_vacancies', 'can_be_remote', 'created_at', 'expired_at')
-    search_fields = ['title', 'company__name']
-    list_filter = ['created_at', 'expired_at', 'can_be_remote', 'skills', 'cities']
+    list_select_related = ['company']
+    search_fields = ['^title', '^company__name']
+    list_filter = ['created_at', 'expired_at', 'can_be_remote', ('company', RelatedAutocompleteFilter),
+                   ('skills', RelatedAutocompleteFilter), ('cities', RelatedAutocompleteFilter),
+                   ('duplicate_of', admin.EmptyFieldListFilter)]
+    autocomplete_fields = ['company', 'skills', 'cities', 'duplicate_of']
+    actions = ['decline_waiting_applicants', 'merge_into_originals']
+
+    def save_model(self, request, obj, form, change):
+        duplicate_of_id = obj.duplicate_of_id
+        super(JobPostAdmin, self).save_model(request, obj, form, change)
+        # flagged by the post_save receiver of api.dedup
+        if obj.duplicate_of_id and obj.duplicate_of_id != duplicate_of_id:
+            original = JobPost.objects.select_related('company').get(id=obj.duplicate_of_id)
+            self.message_user(request, format_html(JOB_POST_DUPLICATE, url=reverse(
+                'admin:api_jobpost_change', args=[original.id]), original=original), level=messages.WARNING)
+
+    def merge_into_originals(self, request, queryset):
+        self.message_user(request, JOB_POSTS_MERGED.format(merged=merge_duplicates(queryset)))
+
+    def decline_waiting_applicants(self, request, queryset):
+        report_transition(self, request, decline_remaining_applicants(queryset),
+                          JobApplicationStatus.company_declined.value[1])
+
+    decline_waiting_applicants.short_description = 'Decline waiting applicants of the selected filled jobs'
+    merge_into_originals.short_description = 'Merge selected duplicates into their originals'
 
 
 @admin.register(JobApplication)
-class JobApplicationAdmin(admin.ModelAdmin):
+class JobApplicationAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('applicant', 'job_post', 'created_at', 'status')
-    search_fields = ['applicant__first_name', 'applicant__last_name', 'job_post__title', 'job_post__company__name']
-    list_filter = ['created_at', 'status', 'job_post__company']
+    list_select_related = ['applicant', 'job_post__company']
+    search_fields = ['^applicant__first_name', '^applicant__last_name', '^applicant__email', '^job_post__title',
+                     '^job_post__company__name']
+    list_filter = ['created_at', 'status', ('job_post__company', RelatedAutocompleteFilter)]
+    raw_id_fields = ['applicant', 'job_post']
+    actions = ['accept_applications', 'decline_applications', 'reopen_applications']
+
+    def has_add_permission(self, request):
+        return False
+
+    def transition(self, request, queryset, status):
+        report_transition(self, request, transition_applications(queryset, status.value[0]), status.value[1])
+
+    def accept_applications(self, request, queryset):
+        self.transition(request, queryset, JobApplicationStatus.company_accepted)
+
+    def decline_applications(self, request, queryset):
+        self.transition(request, queryset, JobApplicationStatus.company_declined)
+
+    def reopen_applications(self, request, queryset):
+        self.transition(request, queryset, JobApplicationStatus.candidate_applied)
+
+    accept_applications.short_description = 'Accept selected applications'
+    decline_applications.short_description = 'Decline selected applications'
+    reopen_applications.short_description = 'Reopen selected declined applications'
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('name', 'applicant', 'can_be_remote', 'search', 'is_active', 'created_at')
+    list_filter = ['is_active', 'created_at']
+    raw_id_fields = ['applicant']
+    autocomplete_fields = ['skills', 'cities', 'companies']
+
+
+@admin.register(HiringStat)
+class HiringStatAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ('bucket_start', 'period', 'company', 'job_post', 'applications', 'saves', 'accepted', 'declined',
+                    'new_jobs')
+    list_select_related = ['company', 'job_post__company']
+    list_filter = ['period', ('company', RelatedAutocompleteFilter), ('job_post', RelatedAutocompleteFilter)]
+    change_list_template = 'admin/api/hiringstat/change_list.html'
+    keyset_field = 'bucket_start'
 
     def has_add_permission(self, request):
         return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        if hasattr(response, 'context_data'):
+            response.context_data['chart'] = self.chart(request)
+        return response
+
+    @staticmethod
+    def chart(request):
+        """
+        Daily applications of the last settings.HIRING_STATS_CHART_DAYS days, for the company/job filtered on.
+        """
+        filters = {}
+        for field, param in (('company_id', 'company__id__exact'), ('job_post_id', 'job_post__id__exact')):
+            try:
+                filters[field] = uuid.UUID(request.GET[param])
+            except (KeyError, ValueError):
+                pass
+        end = ceil_day(timezone.now())
+        start = end - timedelta(days=settings.HIRING_STATS_CHART_DAYS)
+        days = series(start, end, DAY, **filters)
+        peak = max([day['applications'] for day in days] + [1])
+        for day in days:
+            day['height'] = round(100 * day['applications'] / peak)
+        return {'days': days, 'totals': summarize(start, end, **filters)}
+
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -93,5 +207,5 @@ class CustomUserAdmin(UserAdmin):
     )
     list_display = ('email', 'first_name', 'last_name', 'is_active',)
     list_filter = ('is_superuser', 'is_active')
-    search_fields = ('first_name', 'last_name', 'email')
+    search_fields = ('^first_name', '^last_name', '^email')
     ordering = ('first_name',)
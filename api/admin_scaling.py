@@ -0,0 +1,206 @@
+"""
+Admin changelists for tables with millions of rows (JobPost, JobApplication).
+
+- counts: a changelist counts at most settings.ADMIN_COUNT_LIMIT rows; an unfiltered one on a larger table shows
+  the row estimate from the table statistics instead.
+- paging: besides the numbered pages (OFFSET), a "next page" link continues after the last row shown, by
+  (created_at, pk), which costs the same at any depth.
+- filters: RelatedAutocompleteFilter is a select2 box fed by the admin autocomplete view, instead of a sidebar
+  listing every Skill/City/Company.
+- search: '^relation__field' search fields are run as indexed prefix searches on the related table, in an
+  `IN (SELECT ...)` subquery the changelist is filtered on, instead of leading-wildcard LIKEs across joins.
+"""
+from datetime import datetime
+from uuid import UUID
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import get_fields_from_path, lookup_spawns_duplicates
+from django.contrib.admin.views.main import ChangeList, PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+
+CURSOR_VAR = 'after'
+
+
+def estimated_row_count(model, using):
+    """
+    Row count of the model's table from the database statistics, None where they are not available.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('SELECT TABLE_ROWS FROM information_schema.TABLES '
+                           'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [model._meta.db_table])
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # postgres reports -1 for a table that was never analyzed
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_COUNT_LIMIT:
+                self.count_is_exact = False
+                return estimate
+        # SELECT COUNT(*) FROM (SELECT ... LIMIT n): stops reading after n rows
+        count = queryset.order_by()[:settings.ADMIN_COUNT_LIMIT].count()
+        self.count_is_exact = count < settings.ADMIN_COUNT_LIMIT
+        return count
+
+
+def encode_cursor(value, pk):
+    return f'{value.isoformat()}|{pk}'
+
+
+def decode_cursor(cursor):
+    value, _, pk = cursor.partition('|')
+    return datetime.fromisoformat(value), UUID(pk)
+
+
+class KeysetChangeList(ChangeList):
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters(self, request):
+        filter_specs, has_filters, remaining_lookup_params, may_have_duplicates, has_active_filters = (
+            super().get_filters(request))
+        if may_have_duplicates:
+            # an autocomplete filter matches a single related row, so unlike other many to many filters it cannot
+            # return a row twice, and does not need the correlated EXISTS the admin wraps around those
+            may_have_duplicates = any(
+                lookup_spawns_duplicates(self.lookup_opts, key) for key in remaining_lookup_params) or any(
+                lookup_spawns_duplicates(self.lookup_opts, spec.field_path) for spec in filter_specs
+                if isinstance(spec, admin.FieldListFilter) and not isinstance(spec, RelatedAutocompleteFilter)
+                and spec.used_parameters)
+        return filter_specs, has_filters, remaining_lookup_params, may_have_duplicates, has_active_filters
+
+    def get_queryset(self, request):
+        # not a filter, and dropped from every link built from the params (filters, sorting, search form)
+        self.params.pop(CURSOR_VAR, None)
+        return super().get_queryset(request)
+
+    def get_results(self, request):
+        super().get_results(request)
+        keyset_field = self.model_admin.keyset_field
+        self.keyset_ordering = list(self.queryset.query.order_by) == [f'-{keyset_field}', '-pk']
+        if not self.cursor:
+            return
+        if not self.keyset_ordering:
+            raise IncorrectLookupParameters
+        try:
+            value, pk = decode_cursor(self.cursor)
+        except ValueError:
+            raise IncorrectLookupParameters
+        # the redundant `<=` bound lets the database range scan the (keyset_field, pk) index
+        self.result_list = self.queryset.filter(**{f'{keyset_field}__lte': value}).filter(
+            Q(**{f'{keyset_field}__lt': value}) | Q(pk__lt=pk))[:self.list_per_page]
+        self.multi_page = True
+
+    @cached_property
+    def next_page_query_string(self):
+        if not self.keyset_ordering or self.show_all:
+            return None
+        rows = list(self.result_list)
+        if len(rows) < self.list_per_page:
+            return None
+        last = rows[-1]
+        return self.get_query_string({CURSOR_VAR: encode_cursor(getattr(last, self.model_admin.keyset_field),
+                                                                last.pk)}, remove=[PAGE_VAR])
+
+    @cached_property
+    def first_page_query_string(self):
+        return self.get_query_string()
+
+
+class RelatedAutocompleteFilter(admin.FieldListFilter):
+    """
+    Filters on a foreign key or many to many field with a select2 box fed by the admin autocomplete view; the
+    related model's admin needs search_fields. Use as list_filter = [('company', RelatedAutocompleteFilter)].
+    """
+    template = 'admin/api/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.admin_site = model_admin.admin_site
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        widget_id = f'id_filter_{self.lookup_kwarg}'
+        form_field = forms.ModelChoiceField(self.field.remote_field.model._default_manager.all(), required=False,
+                                            widget=AutocompleteSelect(self.field, self.admin_site,
+                                                                      attrs={'id': widget_id, 'style': 'width: 100%'}))
+        yield {
+            'selected': self.lookup_val is not None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': form_field.widget.render(self.lookup_kwarg, self.lookup_val),
+            'id': widget_id,
+        }
+
+
+class ScalableAdminMixin:
+    """
+    ModelAdmin mixin for large tables; see the module docstring. The default ordering must be
+    -`keyset_field` for the "next page" link to show.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/api/scalable_change_list.html'
+    keyset_field = 'created_at'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(list_filter, (list, tuple)) and issubclass(list_filter[1], RelatedAutocompleteFilter)
+               for list_filter in self.list_filter):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_term or not all(field.startswith('^') for field in search_fields):
+            return super().get_search_results(request, queryset, search_term)
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            condition = Q()
+            for field in search_fields:
+                condition |= self.prefix_condition(field[1:], bit)
+            queryset = queryset.filter(condition)
+        may_have_duplicates = any(lookup_spawns_duplicates(self.opts, field[1:]) for field in search_fields)
+        return queryset, may_have_duplicates
+
+    def prefix_condition(self, path, prefix):
+        relation, _, field_name = path.rpartition('__')
+        if not relation:
+            return Q(**{f'{field_name}__istartswith': prefix})
+        related_model = get_fields_from_path(self.model, relation)[-1].related_model
+        # a subquery rather than a list of the matching ids, so that every match counts however many there are
+        matches = related_model._default_manager.filter(**{f'{field_name}__istartswith': prefix}).order_by()
+        return Q(**{f'{relation}__in': matches.values('pk')})
@@ -0,0 +1,192 @@
+"""
+Saved search alerts.
+
+Instead of running every saved search against the JobPost table, saved searches are indexed in memory
+(percolator style) under one "anchor" key each: the longest word of their search text, else each of their
+companies, skills or cities. A new job looks up the postings of its own keys, and only those candidates are
+checked against the full criteria.
+"""
+import logging
+import re
+from collections import defaultdict, namedtuple
+from smtplib import SMTPException
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from api.models import JobPost, SavedSearch, SavedSearchMatch
+
+logger = logging.getLogger(__name__)
+
+# sent once per batch of match_new_jobs, after its transaction commits, with
+# matches ([(saved_search_id, applicant_id, job_post_id)])
+saved_searches_matched = Signal()
+
+Criteria = namedtuple('Criteria', 'id applicant_id skills cities companies can_be_remote terms min_salary')
+JobDocument = namedtuple('JobDocument', 'id skills cities company_id can_be_remote terms annual_pay_to')
+
+MATCH_ALL = ('all',)
+re_word = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return frozenset(re_word.findall(text.lower())) if text else frozenset()
+
+
+def group_related(through_qs, owner_field, target_field, ids=None):
+    if ids is not None:
+        through_qs = through_qs.filter(**{f'{owner_field}__in': ids})
+    related = defaultdict(set)
+    for owner_id, target_id in through_qs.values_list(owner_field, target_field).iterator(chunk_size=10000):
+        related[owner_id].add(target_id)
+    return related
+
+
+class SavedSearchIndex:
+    def __init__(self):
+        self.searches = []
+        self.postings = defaultdict(list)
+
+    def __len__(self):
+        return len(self.searches)
+
+    def add(self, criteria):
+        position = len(self.searches)
+        self.searches.append(criteria)
+        for key in self.anchor_keys(criteria):
+            self.postings[key].append(position)
+
+    @staticmethod
+    def anchor_keys(criteria):
+        # every criterion must hold, so indexing on the most selective one is enough to find all matches
+        if criteria.terms:
+            return [('term', max(criteria.terms, key=len))]
+        if criteria.companies:
+            return [('company', company_id) for company_id in criteria.companies]
+        if criteria.skills:
+            return [('skill', skill_id) for skill_id in criteria.skills]
+        if criteria.cities:
+            return [('city', city_id) for city_id in criteria.cities]
+        return [MATCH_ALL]
+
+    @staticmethod
+    def document_keys(document):
+        yield MATCH_ALL
+        yield 'company', document.company_id
+        for skill_id in document.skills:
+            yield 'skill', skill_id
+        for city_id in document.cities:
+            yield 'city', city_id
+        for term in document.terms:
+            yield 'term', term
+
+    @staticmethod
+    def matches(criteria, document):
+        """
+        Same semantics as the /joblist/ filters, except the search text matches whole words.
+        """
+        if criteria.skills and criteria.skills.isdisjoint(document.skills):
+            return False
+        if criteria.cities and criteria.cities.isdisjoint(document.cities):
+            return False
+        if criteria.companies and document.company_id not in criteria.companies:
+            return False
+        if criteria.can_be_remote is not None and criteria.can_be_remote != document.can_be_remote:
+            return False
+        if criteria.terms and not criteria.terms <= document.terms:
+            return False
+        if criteria.min_salary is not None and document.annual_pay_to < criteria.min_salary:
+            return False
+        return True
+
+    def percolate(self, document):
+        candidates = set()
+        for key in self.document_keys(document):
+            candidates.update(self.postings.get(key, ()))
+        return [self.searches[position] for position in candidates
+                if self.matches(self.searches[position], document)]
+
+
+def build_index():
+    searches = SavedSearch.objects.filter(is_active=True)
+    skills = group_related(SavedSearch.skills.through.objects.filter(savedsearch__is_active=True),
+                           'savedsearch_id', 'skill_id')
+    cities = group_related(SavedSearch.cities.through.objects.filter(savedsearch__is_active=True),
+                           'savedsearch_id', 'city_id')
+    companies = group_related(SavedSearch.companies.through.objects.filter(savedsearch__is_active=True),
+                              'savedsearch_id', 'company_id')
+    index = SavedSearchIndex()
+    empty = frozenset()
+    for search_id, applicant_id, can_be_remote, search, min_salary in searches.values_list(
+            'id', 'applicant_id', 'can_be_remote', 'search', 'min_salary').order_by().iterator(chunk_size=10000):
+        index.add(Criteria(search_id, applicant_id,
+                           frozenset(skills.get(search_id, empty)), frozenset(cities.get(search_id, empty)),
+                           frozenset(companies.get(search_id, empty)), can_be_remote, tokenize(search), min_salary))
+    return index
+
+
+def load_documents(job_post_ids):
+    skills = group_related(JobPost.skills.through.objects, 'jobpost_id', 'skill_id', job_post_ids)
+    cities = group_related(JobPost.cities.through.objects, 'jobpost_id', 'city_id', job_post_ids)
+    rows = JobPost.objects.filter(id__in=job_post_ids).values_list(
+        'id', 'company_id', 'company__name', 'can_be_remote', 'title', 'description', 'annual_pay_to')
+    return [JobDocument(job_post_id, skills.get(job_post_id, set()), cities.get(job_post_id, set()), company_id,
+                        can_be_remote, tokenize(f'{title} {company_name} {description}'), annual_pay_to)
+            for job_post_id, company_id, company_name, can_be_remote, title, description, annual_pay_to in rows]
+
+
+def match_new_jobs(index=None, batch_size=500):
+    """
+    Percolates every job post not yet matched and records a SavedSearchMatch per hit. Returns
+    (jobs processed, matches recorded).
+    """
+    index = build_index() if index is None else index
+    total_jobs = total_matches = 0
+    while True:
+        job_post_ids = list(JobPost.objects.filter(alerts_matched=False).order_by('created_at')
+                            .values_list('id', flat=True)[:batch_size])
+        if not job_post_ids:
+            return total_jobs, total_matches
+        hits = [(criteria.id, criteria.applicant_id, document.id)
+                for document in load_documents(job_post_ids) for criteria in index.percolate(document)]
+        matches = [SavedSearchMatch(saved_search_id=saved_search_id, job_post_id=job_post_id)
+                   for saved_search_id, _, job_post_id in hits]
+        with transaction.atomic():
+            SavedSearchMatch.objects.bulk_create(matches, ignore_conflicts=True, batch_size=1000)
+            JobPost.objects.filter(id__in=job_post_ids).update(alerts_matched=True)
+            if hits:
+                transaction.on_commit(lambda hits=hits: saved_searches_matched.send(sender=SavedSearchMatch,
+                                                                                    matches=hits))
+        total_jobs += len(job_post_ids)
+        total_matches += len(matches)
+
+
+def send_alert_notifications():
+    """
+    Sends every applicant a single email listing all their saved-search matches since the last run. Matches are
+    marked notified once their email is sent; those of an email that failed stay pending for the next run.
+    """
+    pending = SavedSearchMatch.objects.filter(notified_at__isnull=True).order_by(
+        'saved_search__applicant_id', 'saved_search__name').values_list(
+        'id', 'saved_search__applicant__email', 'saved_search__name', 'job_post_id', 'job_post__title')
+    by_email = defaultdict(list)
+    for match_id, email, search_name, job_post_id, title in pending.iterator(chunk_size=10000):
+        by_email[email].append((match_id, search_name, job_post_id, title))
+    sent = 0
+    for email, matches in by_email.items():
+        lines = [f'{search_name}: {title} - {settings.SITE_URL}/jobdetail/{job_post_id}/'
+                 for _, search_name, job_post_id, title in matches]
+        try:
+            send_mail(f'{len(matches)} new job(s) matching your saved searches', '\n'.join(lines),
+                      settings.DEFAULT_FROM_EMAIL, [email])
+        except (SMTPException, OSError):
+            logger.exception('could not send %d saved search match(es) to %s, retrying next run', len(matches),
+                             email)
+            continue
+        SavedSearchMatch.objects.filter(id__in=[match_id for match_id, *_ in matches]).update(
+            notified_at=timezone.now())
+        sent += 1
+    return sent
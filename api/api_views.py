@@ -0,0 +1,365 @@
+import base64
+import json
+import re
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import compress_sequence
+from django.views.generic import View
+
+from api.autocomplete import INDEXES, get_index
+from api import uploads
+from api.caching import rate_limit
+from api.models import JobPost, ChunkedUpload
+from api.rollups import DAY, HOUR, series, summarize
+from api.views import filter_job_posts
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# public field name -> values() lookup
+JOB_POST_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'company': 'company__name',
+    'company_id': 'company_id',
+    'total_vacancies': 'total_vacancies',
+    'payroll_method': 'payroll_method',
+    'pay_range_from': 'pay_range_from',
+    'pay_range_to': 'pay_range_to',
+    'annual_pay_from': 'annual_pay_from',
+    'annual_pay_to': 'annual_pay_to',
+    'can_be_remote': 'can_be_remote',
+    'created_at': 'created_at',
+    'modified_at': 'modified_at',
+    'expired_at': 'expired_at',
+}
+JOB_POST_RELATED_FIELDS = ('skills', 'cities')
+DEFAULT_LIST_FIELDS = ('id', 'title', 'company', 'can_be_remote', 'payroll_method', 'pay_range_from',
+                       'pay_range_to', 'created_at', 'expired_at')
+DEFAULT_DETAIL_FIELDS = tuple(JOB_POST_FIELDS) + JOB_POST_RELATED_FIELDS
+# sort name -> (ordering field, cursor value parser)
+SORTS = {
+    'newest': ('created_at', parse_datetime),
+    'highest_paying': ('annual_pay_to', Decimal),
+}
+
+re_accepts_br = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def encode_cursor(value, pk):
+    # isoformat keeps the microseconds DjangoJSONEncoder would drop, so rows sharing a millisecond aren't skipped
+    value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return base64.urlsafe_b64encode(json.dumps([value, str(pk)]).encode()).decode()
+
+
+def decode_cursor(cursor, parse):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = parse(value)
+    except (ValueError, TypeError, InvalidOperation):
+        value = None
+    if value is None:
+        raise ApiError('Invalid cursor.')
+    return value, pk
+
+
+def get_fields(request, default):
+    fields = request.GET.get('fields')
+    if not fields:
+        return default
+    fields = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = set(fields) - set(JOB_POST_FIELDS) - set(JOB_POST_RELATED_FIELDS)
+    if unknown:
+        raise ApiError(f'Unknown field(s): {", ".join(sorted(unknown))}.')
+    return fields
+
+
+def add_related_names(rows, fields):
+    """
+    Fills skills/cities of `rows` with one query per relation over the whole page instead of one per job.
+    """
+    ids = [row['id'] for row in rows]
+    for field in JOB_POST_RELATED_FIELDS:
+        if field not in fields:
+            continue
+        names = {}
+        through = getattr(JobPost, field).through
+        target = getattr(JobPost, field).field.m2m_reverse_field_name()
+        for job_post_id, name in through.objects.filter(jobpost_id__in=ids).values_list(
+                'jobpost_id', f'{target}__name').order_by(f'{target}__name'):
+            names.setdefault(job_post_id, []).append(name)
+        for row in rows:
+            row[field] = names.get(row['id'], [])
+
+
+def fetch_rows(qs, fields, extra=()):
+    """
+    Reads `fields` (plus `extra` and the id) as plain dicts straight from values(), no model instances.
+    """
+    wanted = set(fields) | set(extra) | {'id'}
+    lookups = {lookup: field for field, lookup in JOB_POST_FIELDS.items() if field in wanted}
+    rows = [{lookups[lookup]: value for lookup, value in values.items()} for values in qs.values(*lookups)]
+    add_related_names(rows, fields)
+    return rows
+
+
+def project(row, fields):
+    return {field: row[field] for field in fields}
+
+
+def compress(request, response):
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if brotli is not None and re_accepts_br.search(accept_encoding):
+        response.streaming_content = brotli_sequence(response.streaming_content)
+        response['Content-Encoding'] = 'br'
+    elif re_accepts_gzip.search(accept_encoding):
+        response.streaming_content = compress_sequence(response.streaming_content)
+        response['Content-Encoding'] = 'gzip'
+    return response
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=5)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class ApiView(View):
+    use_read_replica = True
+    http_method_names = ['get', 'head', 'options']
+
+    def dispatch(self, request, *args, **kwargs):
+        client = f'user:{request.user.id}' if request.user.is_authenticated else f'ip:{request.META.get("REMOTE_ADDR")}'
+        retry_after = rate_limit(f'api:{client}', settings.API_RATE_LIMIT, settings.API_RATE_LIMIT_WINDOW)
+        if retry_after:
+            response = JsonResponse({'error': 'Rate limit exceeded.'}, status=429)
+            response['Retry-After'] = retry_after
+            return response
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except (ApiError, uploads.UploadError) as e:
+            return JsonResponse({'error': e.message}, status=e.status)
+        except ValidationError as e:
+            return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+
+    def stream(self, request, chunks):
+        response = StreamingHttpResponse(chunks, content_type='application/json')
+        return compress(request, response)
+
+
+class JobPostListApiView(ApiView):
+    """
+    GET /api/v1/jobs/ - same filters as /joblist/, plus `fields`, `sort`, `limit` and `cursor`.
+    """
+
+    def get(self, request):
+        fields = get_fields(request, DEFAULT_LIST_FIELDS)
+        sort = request.GET.get('sort', 'newest')
+        if sort not in SORTS:
+            raise ApiError(f'Unknown sort "{sort}".')
+        order_field, parse = SORTS[sort]
+        try:
+            limit = min(max(int(request.GET.get('limit', settings.API_PAGE_SIZE)), 1), settings.API_MAX_PAGE_SIZE)
+        except ValueError:
+            raise ApiError('Invalid limit.')
+
+        qs = JobPost.objects.filter(expired_at__gte=timezone.now())
+        qs = filter_job_posts(qs, request.GET)
+        cursor = request.GET.get('cursor')
+        if cursor:
+            # keyset pagination: continue strictly after the last row of the previous page
+            value, pk = decode_cursor(cursor, parse)
+            qs = qs.filter(Q(**{f'{order_field}__lt': value}) | Q(**{order_field: value, 'id__lt': pk}))
+        qs = qs.order_by(f'-{order_field}', '-id').distinct()
+
+        rows = fetch_rows(qs[:limit + 1], fields, extra=(order_field,))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][order_field], rows[-1]['id'])
+        rows = [project(row, fields) for row in rows]
+        return self.stream(request, self.encode_page(rows, next_cursor))
+
+    @staticmethod
+    def encode_page(rows, next_cursor):
+        yield '{"data":['
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + encoder.encode(row)
+        yield '],"next_cursor":' + encoder.encode(next_cursor) + '}'
+
+
+class JobPostDetailApiView(ApiView):
+    """
+    GET /api/v1/jobs/<id>/ - a single job post, supports `fields`.
+    """
+
+    def get(self, request, pk):
+        fields = get_fields(request, DEFAULT_DETAIL_FIELDS)
+        rows = fetch_rows(JobPost.objects.filter(id=pk), fields)
+        if not rows:
+            raise ApiError('Not found.', status=404)
+        return self.stream(request, [encoder.encode({'data': project(rows[0], fields)})])
+
+
+class AutocompleteApiView(ApiView):
+    """
+    GET /api/v1/autocomplete/<skills|cities|companies>/?q=<prefix> - names starting with the prefix,
+    most active jobs first.
+    """
+
+    def get(self, request, kind):
+        if kind not in INDEXES:
+            raise ApiError('Not found.', status=404)
+        prefix = request.GET.get('q', '').strip()
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), settings.AUTOCOMPLETE_MAX_RESULTS)
+        except ValueError:
+            raise ApiError('Invalid limit.')
+        results = get_index(kind).search(prefix, limit) if prefix else []
+        return JsonResponse({'results': [{'id': pk, 'name': name, 'active_jobs': active_jobs}
+                                         for pk, name, active_jobs in results]})
+
+
+def parse_moment(value, name):
+    """
+    An ISO datetime, or an ISO date meaning its UTC midnight; naive datetimes are taken as UTC.
+    """
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, time()) if day else None
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ApiError(f'Invalid {name}, expected an ISO date or datetime.')
+    return moment if timezone.is_aware(moment) else moment.replace(tzinfo=dt_timezone.utc)
+
+
+def parse_uuid(value, name):
+    try:
+        return uuid.UUID(value) if value else None
+    except ValueError:
+        raise ApiError(f'Invalid {name}.')
+
+
+class HiringStatsApiView(ApiView):
+    """
+    GET /api/v1/stats/hiring/ - staff only. Applications, saves, accepted, declined, new jobs and acceptance rate
+    over [`from`, `to`) (default: the last 30 days), optionally for one `company` or `job`, with `group_by`
+    company, job_post, day or hour for one row per group.
+    """
+    group_bys = ('company', 'job_post', 'day', 'hour')
+
+    def get(self, request):
+        if not request.user.is_staff:
+            raise ApiError('Forbidden.', status=403)
+        end = parse_moment(request.GET['to'], 'to') if request.GET.get('to') else timezone.now()
+        start = parse_moment(request.GET['from'], 'from') if request.GET.get('from') else end - timedelta(days=30)
+        if start >= end:
+            raise ApiError('from must be before to.')
+        filters = {'company_id': parse_uuid(request.GET.get('company'), 'company'),
+                   'job_post_id': parse_uuid(request.GET.get('job'), 'job')}
+        group_by = request.GET.get('group_by')
+        if group_by and group_by not in self.group_bys:
+            raise ApiError(f'Unknown group_by "{group_by}".')
+        data = {'from': start, 'to': end, 'totals': summarize(start, end, **filters)}
+        if group_by in ('day', 'hour'):
+            data['rows'] = series(start, end, DAY if group_by == 'day' else HOUR, **filters)
+        elif group_by:
+            data['rows'] = summarize(start, end, group_by=group_by, **filters)
+        return JsonResponse(data, encoder=DjangoJSONEncoder)
+
+
+def upload_state(upload, received, status=200):
+    data = {'id': upload.id, 'kind': upload.kind, 'size': upload.size, 'offset': received,
+            'chunk_size': settings.UPLOAD_CHUNK_SIZE}
+    if upload.stored_name:
+        data['url'] = uploads.stored_url(upload)
+    response = JsonResponse(data, status=status)
+    response['Upload-Offset'] = received
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+class UploadApiView(ApiView):
+    """
+    POST /api/v1/uploads/ with `kind` (resume or profile_picture) and `size` in bytes: starts a chunked upload of
+    the signed in user's file, see api.uploads.
+    """
+    use_read_replica = False
+    http_method_names = ['post', 'options']
+
+    def post(self, request):
+        if not request.user.is_authenticated:
+            raise ApiError('Forbidden.', status=403)
+        kind = request.POST.get('kind')
+        if kind not in settings.UPLOAD_MAX_SIZES:
+            raise ApiError(f'Unknown kind "{kind}".')
+        try:
+            size = int(request.POST.get('size', ''))
+        except ValueError:
+            raise ApiError('Invalid size.')
+        return upload_state(uploads.start(request.user, kind, size), 0, status=201)
+
+
+class UploadChunkApiView(ApiView):
+    """
+    /api/v1/uploads/<id>/ - GET: the offset to resume at. PATCH with an Upload-Offset header and the next chunk
+    as body: appends it, and once the file is complete stores it and answers with its `url`, as both do for a
+    complete upload until it expires. DELETE: cancels.
+    """
+    use_read_replica = False
+    http_method_names = ['get', 'head', 'patch', 'delete', 'options']
+
+    def get_upload(self, request, pk):
+        upload = ChunkedUpload.objects.filter(id=pk, user_id=request.user.id).select_related('user').first()
+        if upload is None:
+            raise ApiError('Not found.', status=404)
+        return upload
+
+    def get(self, request, pk):
+        upload = self.get_upload(request, pk)
+        return upload_state(upload, uploads.offset(upload))
+
+    def patch(self, request, pk):
+        upload = self.get_upload(request, pk)
+        try:
+            start = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            raise ApiError('Missing or invalid Upload-Offset header.')
+        try:
+            length = int(request.META['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            raise ApiError('Content-Length required.', status=411)
+        return upload_state(upload, uploads.append(upload, request, start, length))
+
+    def delete(self, request, pk):
+        uploads.cancel([self.get_upload(request, pk)])
+        return HttpResponse(status=204)
@@ -0,0 +1,85 @@
+"""
+Bulk JobApplication status transitions.
+
+Applications move between statuses with set-based UPDATEs of at most settings.APPLICATION_TRANSITION_BATCH_SIZE
+rows each, instead of one model save per row; an UPDATE only touches rows whose current status may move to the
+new one (APPLICATION_STATUS_TRANSITIONS), the others are skipped and counted. Every batch sends one
+`applications_status_changed` signal, after its transaction commits.
+"""
+import logging
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from api.choices import JobApplicationStatus, APPLICATION_STATUS_TRANSITIONS
+from api.models import JobApplication, JobPost
+
+logger = logging.getLogger(__name__)
+
+# sent once per batch with: status (the new one), application_ids, job_post_ids, job_post_counts ({id: moved}),
+# applications ([(id, applicant_id, job_post_id, previous status)])
+applications_status_changed = Signal()
+
+TransitionResult = namedtuple('TransitionResult', 'updated skipped batches')
+
+
+def transition_applications(queryset, status, batch_size=None):
+    """
+    Moves every application of `queryset` that may go to `status`. Returns a TransitionResult: applications
+    updated, applications skipped because their status cannot move to `status`, and batches run.
+    """
+    batch_size = batch_size or settings.APPLICATION_TRANSITION_BATCH_SIZE
+    sources = [source for source, targets in APPLICATION_STATUS_TRANSITIONS.items() if status in targets]
+    skipped = queryset.exclude(status__in=sources).exclude(status=status).count()
+    candidates = queryset.filter(status__in=sources).order_by('pk').values_list('pk', flat=True)
+    updated = batches = 0
+    last_pk = None
+    while True:
+        page = candidates if last_pk is None else candidates.filter(pk__gt=last_pk)
+        ids = list(page[:batch_size])
+        if not ids:
+            return TransitionResult(updated, skipped, batches)
+        last_pk = ids[-1]
+        with transaction.atomic():
+            # locked and re-checked, in case a reviewer changed some of them since they were listed
+            rows = list(JobApplication.objects.select_for_update().filter(pk__in=ids, status__in=sources)
+                        .values_list('pk', 'applicant_id', 'job_post_id', 'status'))
+            moved = [pk for pk, *_ in rows]
+            JobApplication.objects.filter(pk__in=moved).update(status=status, modified_at=timezone.now())
+            transaction.on_commit(lambda rows=rows: send_status_changed(status, rows))
+        updated += len(moved)
+        skipped += len(ids) - len(moved)
+        batches += 1
+
+
+def send_status_changed(status, rows):
+    job_post_counts = Counter(job_post_id for _, _, job_post_id, _ in rows)
+    logger.info('%d application(s) of %d job(s) moved to %s', len(rows), len(job_post_counts), status)
+    applications_status_changed.send(sender=JobApplication, status=status, application_ids=[pk for pk, *_ in rows],
+                                     job_post_ids=set(job_post_counts), job_post_counts=dict(job_post_counts),
+                                     applications=rows)
+
+
+def filled_job_posts(job_posts=None):
+    """
+    Job posts with at least as many accepted applications as vacancies.
+    """
+    job_posts = JobPost.objects.all() if job_posts is None else job_posts
+    accepted = JobApplicationStatus.company_accepted.value[0]
+    return job_posts.annotate(
+        accepted=Count('job_applications', filter=Q(job_applications__status=accepted))).filter(
+        accepted__gte=F('total_vacancies'))
+
+
+def decline_remaining_applicants(job_posts=None, batch_size=None):
+    """
+    Declines the applications still waiting (APP) on every filled job post of `job_posts` (default: all).
+    """
+    applied = JobApplicationStatus.candidate_applied.value[0]
+    filled = filled_job_posts(job_posts).values('pk')
+    return transition_applications(JobApplication.objects.filter(job_post__in=filled, status=applied),
+                                   JobApplicationStatus.company_declined.value[0], batch_size)
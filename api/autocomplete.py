@@ -0,0 +1,166 @@
+"""
+In-memory prefix indexes over Skill, City and Company names for the typeahead endpoint.
+
+Each index keeps the lower-cased names in a sorted list, so the names starting with a prefix are one bisect
+range; the range is ranked by popularity (number of active jobs). Rankings of large ranges (short prefixes)
+are memoized until the index next changes. Indexes are updated from model signals in this process and
+fully rebuilt every settings.AUTOCOMPLETE_REBUILD_SECONDS, which also picks up jobs that expired and
+writes made by other processes. Only the first build is waited for (once, however many requests arrive); after
+that a stale or invalidated index keeps answering while a single background thread rebuilds it.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Count
+from django.utils import timezone
+
+from api.caching import single_flight
+from api.models import Skill, City, Company, JobPost
+
+logger = logging.getLogger(__name__)
+
+SMALL_RANGE = 256
+
+
+def skill_popularity():
+    return JobPost.skills.through.objects.filter(jobpost__expired_at__gte=timezone.now()).values_list(
+        'skill_id').annotate(total=Count('jobpost_id')).order_by()
+
+
+def city_popularity():
+    return JobPost.cities.through.objects.filter(jobpost__expired_at__gte=timezone.now()).values_list(
+        'city_id').annotate(total=Count('jobpost_id')).order_by()
+
+
+def company_popularity():
+    return JobPost.objects.filter(expired_at__gte=timezone.now()).values_list(
+        'company_id').annotate(total=Count('id')).order_by()
+
+
+class PrefixIndex:
+    def __init__(self, model, popularity):
+        self.model = model
+        self.popularity_query = popularity
+        self.lock = threading.Lock()
+        # held by the thread rebuilding the index
+        self.build_lock = threading.Lock()
+        self.invalidated = False
+        self.keys = []
+        self.entries = []
+        self.names = {}
+        self.popularity = {}
+        self.top = {}
+        self.built_at = None
+
+    def build(self):
+        # invalidations from here on are not reflected in what is read, so they leave the index stale
+        self.invalidated = False
+        rows = sorted((name.lower(), name, pk) for pk, name in self.model.objects.values_list('id', 'name'))
+        popularity = dict(self.popularity_query())
+        with self.lock:
+            self.keys = [key for key, _, _ in rows]
+            self.entries = [(pk, name) for _, name, pk in rows]
+            self.names = {pk: name for _, name, pk in rows}
+            self.popularity = popularity
+            self.top = {}
+            self.built_at = time.monotonic()
+
+    def is_stale(self):
+        return (self.built_at is None or self.invalidated or
+                time.monotonic() - self.built_at > settings.AUTOCOMPLETE_REBUILD_SECONDS)
+
+    def invalidate(self):
+        self.invalidated = True
+
+    def refresh(self):
+        """
+        Builds the index on first use, the concurrent first uses sharing one build. Once built, a stale index is
+        rebuilt by one background thread while it keeps being served.
+        """
+        if self.built_at is None:
+            single_flight.run(f'autocomplete:{self.model._meta.label}', self.build_once)
+        elif self.is_stale() and self.build_lock.acquire(blocking=False):
+            threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def build_once(self):
+        if self.built_at is None:
+            self.build()
+
+    def rebuild(self):
+        try:
+            self.build()
+        except DatabaseError:
+            # served as it is until the next attempt
+            logger.exception('could not rebuild the %s autocomplete index', self.model._meta.verbose_name)
+        finally:
+            self.build_lock.release()
+            connections.close_all()
+
+    def search(self, prefix, limit):
+        prefix = prefix.lower()
+        with self.lock:
+            results = self.top.get(prefix)
+            if results is None:
+                start = bisect.bisect_left(self.keys, prefix)
+                end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+                positions = heapq.nlargest(
+                    settings.AUTOCOMPLETE_MAX_RESULTS, range(start, end),
+                    key=lambda position: (self.popularity.get(self.entries[position][0], 0), -position))
+                results = [(self.entries[position][0], self.entries[position][1],
+                            self.popularity.get(self.entries[position][0], 0)) for position in positions]
+                if end - start > SMALL_RANGE:
+                    self.top[prefix] = results
+            return results[:limit]
+
+    def upsert(self, pk, name):
+        with self.lock:
+            self._remove(pk)
+            key = name.lower()
+            position = bisect.bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.entries.insert(position, (pk, name))
+            self.names[pk] = name
+            self.top = {}
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove(pk)
+            self.top = {}
+
+    def _remove(self, pk):
+        name = self.names.pop(pk, None)
+        if name is None:
+            return
+        key = name.lower()
+        position = bisect.bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.entries[position][0] == pk:
+                del self.keys[position]
+                del self.entries[position]
+                return
+            position += 1
+
+    def adjust(self, pks, delta):
+        with self.lock:
+            for pk in pks:
+                self.popularity[pk] = self.popularity.get(pk, 0) + delta
+            self.top = {}
+
+
+INDEXES = {
+    'skills': PrefixIndex(Skill, skill_popularity),
+    'cities': PrefixIndex(City, city_popularity),
+    'companies': PrefixIndex(Company, company_popularity),
+}
+INDEX_BY_MODEL = {index.model: index for index in INDEXES.values()}
+
+
+def get_index(kind):
+    index = INDEXES[kind]
+    index.refresh()
+    return index
@@ -0,0 +1,139 @@
+import contextvars
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def rate_limit(key, limit, window, using='default'):
+    """
+    Sliding window counter kept in the `using` cache: the previous window's count is weighted by how much of it
+    still overlaps the sliding window. Counts this call and returns the seconds to wait, 0 when it is allowed.
+    """
+    cache = caches[using]
+    now = time.time()
+    current_window = int(now // window)
+    elapsed = (now % window) / window
+    current_key = f'rate:{key}:{current_window}'
+    previous = cache.get(f'rate:{key}:{current_window - 1}', 0)
+    cache.add(current_key, 0, window * 2)
+    try:
+        count = cache.incr(current_key)
+    except ValueError:
+        # evicted between add and incr
+        cache.set(current_key, 1, window * 2)
+        count = 1
+    if previous * (1 - elapsed) + count > limit:
+        return max(1, int(window * (1 - elapsed)))
+    return 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key in this process into one: the first caller runs `compute`,
+    the others wait for its result.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def run(self, key, compute):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+        try:
+            call['result'] = compute()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+
+
+single_flight = SingleFlight()
+
+
+def tag_version_key(tag):
+    return f'tag-version:{tag}'
+
+
+def get_tag_versions(tags):
+    versions = cache.get_many([tag_version_key(tag) for tag in tags])
+    return [str(versions.get(tag_version_key(tag), 0)) for tag in tags]
+
+
+def invalidate_tags(tags):
+    """
+    Bumps the version of every tag, which changes the key of every cached result depending on it.
+    """
+    version = time.time_ns()
+    cache.set_many({tag_version_key(tag): version for tag in tags}, None)
+
+
+def cached_result(signature, tags, compute, fresh, stale, is_valid=None):
+    """
+    Returns compute() through the cache with single-flight and stale-while-revalidate:
+    - fresh for `fresh` seconds, then served as-is for up to `stale` more seconds while one background
+      thread (per cache, guarded by a cache lock) recomputes it;
+    - on a miss, concurrent callers in this process share one compute(), and callers in other processes wait
+      briefly for the one holding the lock before computing themselves.
+    A change to any of `tags` (see invalidate_tags), or `is_valid(value)` returning False, makes it a miss.
+    """
+    key = 'result:' + hashlib.md5(':'.join([signature] + list(tags) + get_tag_versions(tags)).encode()).hexdigest()
+    lock_key = key + ':lock'
+
+    def refresh():
+        try:
+            value = compute()
+            cache.set(key, {'value': value, 'fresh_until': time.time() + fresh}, fresh + stale)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    entry = cache.get(key)
+    if entry is not None and is_valid is not None and not is_valid(entry['value']):
+        entry = None
+    if entry is not None:
+        if entry['fresh_until'] < time.time() and cache.add(lock_key, 1, settings.RESULT_CACHE_LOCK_TIMEOUT):
+            context = contextvars.copy_context()
+            threading.Thread(target=run_in_background, args=(context, refresh), daemon=True).start()
+        return entry['value']
+
+    def fill():
+        if not cache.add(lock_key, 1, settings.RESULT_CACHE_LOCK_TIMEOUT):
+            # another process is computing it, give it a moment
+            deadline = time.time() + settings.RESULT_CACHE_LOCK_WAIT
+            while time.time() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None and (is_valid is None or is_valid(entry['value'])):
+                    return entry['value']
+        return refresh()
+
+    return single_flight.run(key, fill)
+
+
+def run_in_background(context, function):
+    try:
+        context.run(function)
+    except Exception:
+        logger.exception('background cache refresh failed')
+    finally:
+        connections.close_all()
@@ -22,3 +22,31 @@ class JobApplicationStatus(ChoiceEnum):
     candidate_applied = ('APP', 'Candidate Applied')
     company_declined = ('DEC', 'Company Declined')
     company_accepted = ('ACC', 'Company Accepted')
+
+
+class RollupPeriod(ChoiceEnum):
+    hourly = ('H', 'Hourly')
+    daily = ('D', 'Daily')
+
+
+# values are the names of the CustomUser file fields the uploads end up in
+class UploadKind(ChoiceEnum):
+    resume = ('resume', 'Resume')
+    profile_picture = ('profile_picture', 'Profile Picture')
+
+
+# number of pay periods in a year, used to bring every payroll method onto a comparable annual scale
+PAYROLL_PERIODS_PER_YEAR = {
+    PayRollChoice.hourly.value[0]: 2080,
+    PayRollChoice.weekly.value[0]: 52,
+    PayRollChoice.monthly.value[0]: 12,
+    PayRollChoice.annually.value[0]: 1,
+}
+
+# statuses an application may move to from each status; reopening a declined application puts it back to applied
+APPLICATION_STATUS_TRANSITIONS = {
+    JobApplicationStatus.candidate_applied.value[0]: {JobApplicationStatus.company_accepted.value[0],
+                                                      JobApplicationStatus.company_declined.value[0]},
+    JobApplicationStatus.company_accepted.value[0]: {JobApplicationStatus.company_declined.value[0]},
+    JobApplicationStatus.company_declined.value[0]: {JobApplicationStatus.candidate_applied.value[0]},
+}
@@ -0,0 +1,268 @@
+"""
+Near-duplicate job post detection.
+
+Every job post gets a MinHash signature of the word shingles of its title and description (JobPostSignature). The
+signature is cut into settings.JOB_DEDUP_BANDS bands, and each band is hashed into a bucket key (JobPostBucket).
+Posts of the same company that share a bucket are the only candidates compared, so a lookup reads a few index
+entries however many posts the company has. A candidate whose signatures agree on at least
+settings.JOB_DEDUP_THRESHOLD of their positions (the estimated Jaccard similarity of the shingle sets) is a
+near-duplicate. A post is flagged as a duplicate (JobPost.duplicate_of) of the oldest such post created before it.
+
+Single saves are indexed and flagged by a post_save receiver (api.signals). Posts written with bulk_create go
+through index_job_posts, as the dedupe_job_posts command does for the whole catalogue. merge_duplicates folds
+flagged posts into their originals.
+"""
+import hashlib
+import logging
+import random
+import re
+import struct
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from api import summaries
+from api.models import JobPost, JobPostSignature, JobPostBucket, JobApplication, SavedJob
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_WORDS = 3
+# permutations are h(x) = (a * x + b) mod PRIME over the 32 bit crc of each shingle; a < 2 ** 31 keeps
+# a * x + b below 2 ** 63, so numpy's uint64 arithmetic and python's agree
+PRIME = 4294967291
+# a fixed seed: signatures stored by one process are compared with those computed by another
+SEED = 20221
+# keys per bucket__in query
+LOOKUP_CHUNK = 1000
+WORD_RE = re.compile(r'\w+')
+
+
+def permutations():
+    """
+    (a, b) coefficients of the JOB_DEDUP_BANDS * JOB_DEDUP_ROWS hash functions. Changing either setting changes
+    every signature: rebuild with dedupe_job_posts --rebuild.
+    """
+    rng = random.Random(SEED)
+    count = settings.JOB_DEDUP_BANDS * settings.JOB_DEDUP_ROWS
+    return [(rng.randrange(1, 2 ** 31), rng.randrange(0, 2 ** 32)) for _ in range(count)]
+
+
+def shingle_hashes(title, description):
+    words = WORD_RE.findall(f'{title} {description}'.lower())
+    if not words:
+        return []
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    return sorted(zlib.crc32(shingle.encode()) for shingle in shingles)
+
+
+def signatures(texts):
+    """
+    MinHash signatures (tuples of ints) of the (title, description) pairs of `texts`, None for a text without
+    words. With numpy the whole batch is one matrix operation.
+    """
+    coefficients = permutations()
+    hashes = [shingle_hashes(title, description) for title, description in texts]
+    if numpy is None:
+        return [tuple(min((a * x + b) % PRIME for x in values) for a, b in coefficients) if values else None
+                for values in hashes]
+    present = [i for i, values in enumerate(hashes) if values]
+    result = [None] * len(hashes)
+    if not present:
+        return result
+    a = numpy.array([a for a, _ in coefficients], dtype=numpy.uint64)
+    b = numpy.array([b for _, b in coefficients], dtype=numpy.uint64)
+    values = numpy.array([x for i in present for x in hashes[i]], dtype=numpy.uint64)
+    # one row per shingle of the batch, one column per permutation; minimum over the rows of each text
+    permuted = (numpy.outer(values, a) + b) % numpy.uint64(PRIME)
+    offsets = numpy.cumsum([0] + [len(hashes[i]) for i in present[:-1]])
+    for i, row in zip(present, numpy.minimum.reduceat(permuted, offsets, axis=0)):
+        result[i] = tuple(int(value) for value in row)
+    return result
+
+
+def pack(signature):
+    return struct.pack(f'<{len(signature)}I', *signature)
+
+
+def unpack(data):
+    data = bytes(data)
+    return struct.unpack(f'<{len(data) // 4}I', data)
+
+
+def bucket_keys(signature):
+    rows = settings.JOB_DEDUP_ROWS
+    keys = []
+    for band in range(settings.JOB_DEDUP_BANDS):
+        digest = hashlib.blake2b(struct.pack('<H', band) + pack(signature[band * rows:(band + 1) * rows]),
+                                 digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(signature, other):
+    """
+    Estimated Jaccard similarity of the shingle sets behind two signatures.
+    """
+    if len(signature) != len(other):
+        return 0.0
+    return sum(x == y for x, y in zip(signature, other)) / len(signature)
+
+
+@transaction.atomic
+def store(job_posts, computed):
+    """
+    Replaces the signatures and bucket keys of `job_posts` with `computed` ({job_post_id: signature or None}).
+    """
+    ids = [job_post.id for job_post in job_posts]
+    JobPostSignature.objects.filter(job_post_id__in=ids).delete()
+    JobPostBucket.objects.filter(job_post_id__in=ids).delete()
+    JobPostSignature.objects.bulk_create(
+        [JobPostSignature(job_post_id=job_post.id, company_id=job_post.company_id,
+                          signature=pack(computed[job_post.id]))
+         for job_post in job_posts if computed[job_post.id]])
+    JobPostBucket.objects.bulk_create(
+        [JobPostBucket(job_post_id=job_post.id, company_id=job_post.company_id, bucket=key)
+         for job_post in job_posts if computed[job_post.id] for key in bucket_keys(computed[job_post.id])],
+        batch_size=1000)
+
+
+def candidates(job_posts, computed):
+    """
+    {job_post_id: {candidate_id}}: posts of the same company sharing a bucket with each of `job_posts`.
+    """
+    wanted = defaultdict(set)
+    for job_post in job_posts:
+        if computed[job_post.id]:
+            for key in bucket_keys(computed[job_post.id]):
+                wanted[(job_post.company_id, key)].add(job_post.id)
+    found = defaultdict(set)
+    keys = sorted({key for _, key in wanted})
+    company_ids = {company_id for company_id, _ in wanted}
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        rows = JobPostBucket.objects.filter(bucket__in=keys[start:start + LOOKUP_CHUNK],
+                                            company_id__in=company_ids).values_list('company_id', 'bucket',
+                                                                                    'job_post_id')
+        for company_id, key, candidate_id in rows:
+            for job_post_id in wanted.get((company_id, key), ()):
+                if candidate_id != job_post_id:
+                    found[job_post_id].add(candidate_id)
+    return found
+
+
+def find_originals(job_posts, computed):
+    """
+    {job_post_id: original_id} for the posts of `job_posts` that near-duplicate an older post; the original is
+    the oldest such post, or what it is itself flagged a duplicate of.
+    """
+    found = candidates(job_posts, computed)
+    if not found:
+        return {}
+    candidate_ids = set().union(*found.values())
+    stored = {job_post_id: unpack(signature) for job_post_id, signature in
+              JobPostSignature.objects.filter(job_post_id__in=candidate_ids).values_list('job_post_id', 'signature')}
+    posts = {row[0]: row[1:] for row in
+             JobPost.objects.filter(id__in=candidate_ids).values_list('id', 'created_at', 'duplicate_of_id')}
+    originals = {}
+    for job_post in job_posts:
+        matches = sorted(
+            (posts[candidate_id][0], str(candidate_id), candidate_id) for candidate_id in found.get(job_post.id, ())
+            if candidate_id in posts and candidate_id in stored
+            and (posts[candidate_id][0], str(candidate_id)) < (job_post.created_at, str(job_post.id))
+            and similarity(computed[job_post.id], stored[candidate_id]) >= settings.JOB_DEDUP_THRESHOLD)
+        if matches:
+            original_id = matches[0][2]
+            originals[job_post.id] = posts[original_id][1] or original_id
+    return originals
+
+
+def index_job_posts(job_posts):
+    """
+    Computes and stores the signatures of `job_posts` (a list, all of them saved), then flags those that
+    near-duplicate an older post of their company and are not flagged yet. Returns {job_post_id: original_id} of
+    the posts found to be duplicates.
+    """
+    computed = dict(zip([job_post.id for job_post in job_posts],
+                        signatures([(job_post.title, job_post.description) for job_post in job_posts])))
+    store(job_posts, computed)
+    originals = find_originals(job_posts, computed)
+    for job_post_id, original_id in originals.items():
+        # an original flagged in this same batch: point at what it duplicates (older, so this ends)
+        while original_id in originals:
+            original_id = originals[original_id]
+        originals[job_post_id] = original_id
+    for job_post in job_posts:
+        if job_post.id in originals and not job_post.duplicate_of_id:
+            JobPost.objects.filter(id=job_post.id).update(duplicate_of=originals[job_post.id])
+            job_post.duplicate_of_id = originals[job_post.id]
+    return originals
+
+
+def index_job_post(job_post):
+    """
+    Indexes a saved post unless its text and company are those already indexed.
+    """
+    signature, = signatures([(job_post.title, job_post.description)])
+    indexed = JobPostSignature.objects.filter(job_post_id=job_post.id).values_list('company_id', 'signature').first()
+    if indexed and signature and indexed[0] == job_post.company_id and unpack(indexed[1]) == signature:
+        return
+    index_job_posts([job_post])
+
+
+def root_original(job_post_id):
+    """
+    The post `job_post_id` is a duplicate of, following duplicate_of through posts that are duplicates themselves.
+    None if it is not flagged, or if the chain loops back.
+    """
+    chain = {job_post_id}
+    original_id = JobPost.objects.filter(id=job_post_id).values_list('duplicate_of_id', flat=True).first()
+    while original_id:
+        if original_id in chain:
+            return None
+        chain.add(original_id)
+        next_id = JobPost.objects.filter(id=original_id).values_list('duplicate_of_id', flat=True).first()
+        if not next_id:
+            return original_id
+        original_id = next_id
+    return None
+
+
+def merge_duplicates(job_posts):
+    """
+    Folds every flagged post of `job_posts` into its original (the end of its duplicate_of chain): its applications
+    and saves move to the original, except for applicants who already have one there, then it is deleted. A post
+    whose chain loops back to it is left alone. Returns the number of posts merged.
+    The hiring stats of a merged post are deleted with it; rollup_hiring_stats over the days concerned counts
+    the moved applications and saves on the original. The candidate summaries of the applicants concerned are
+    rebuilt, as the moves send no signals.
+    """
+    merged = 0
+    for duplicate_id in list(job_posts.filter(duplicate_of__isnull=False).values_list('id', flat=True)):
+        with transaction.atomic():
+            # read again under lock: merges earlier in the loop repoint or delete posts of the selection
+            if not JobPost.objects.select_for_update().filter(id=duplicate_id, duplicate_of__isnull=False).exists():
+                continue
+            original_id = root_original(duplicate_id)
+            if original_id is None:
+                logger.warning('job post %s is a duplicate of itself through its chain, not merged', duplicate_id)
+                continue
+            applicant_ids = set()
+            for model in (JobApplication, SavedJob):
+                applicant_ids.update(model.objects.filter(job_post_id=duplicate_id).values_list('applicant_id',
+                                                                                                 flat=True))
+                taken = model.objects.filter(job_post_id=original_id).values('applicant_id')
+                model.objects.filter(job_post_id=duplicate_id).exclude(applicant_id__in=taken).update(
+                    job_post_id=original_id)
+            # flagged against this one before it was merged
+            JobPost.objects.filter(duplicate_of_id=duplicate_id).update(duplicate_of_id=original_id)
+            JobPost.objects.filter(id=duplicate_id).delete()
+            summaries.rebuild_on_commit(applicant_ids)
+        merged += 1
+        logger.info('merged job post %s into %s', duplicate_id, original_id)
+    return merged
@@ -0,0 +1,66 @@
+"""
+Radius search over City coordinates without a spatial database extension.
+
+Every city stores the key of the GRID_DEGREES x GRID_DEGREES grid cell it falls in (City.grid_cell, indexed).
+A radius query turns the circle into a bounding box, selects the cities in the cells the box overlaps
+(plus the latitude range) through the index, and keeps the ones within the exact haversine distance.
+"""
+import math
+
+from api.models import City
+
+EARTH_RADIUS_KM = 6371.0088
+GRID_DEGREES = 0.5
+GRID_COLUMNS = int(360 / GRID_DEGREES)
+# beyond this many cells (huge radius, or close to a pole) the latitude range alone is the prefilter
+MAX_CELLS = 400
+
+
+def grid_cell(latitude, longitude):
+    row = math.floor(latitude / GRID_DEGREES)
+    column = math.floor(longitude / GRID_DEGREES) % GRID_COLUMNS
+    return f'{row}:{column}'
+
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(longitude2 - longitude1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    d_latitude = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_latitude, max_latitude = max(latitude - d_latitude, -90.0), min(latitude + d_latitude, 90.0)
+    cos_latitude = math.cos(math.radians(max(abs(min_latitude), abs(max_latitude))))
+    if cos_latitude < 1e-6 or radius_km / (EARTH_RADIUS_KM * cos_latitude) >= math.pi:
+        # the box reaches a pole or wraps all the way around: every longitude
+        return min_latitude, max_latitude, -180.0, 180.0
+    d_longitude = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_latitude))
+    return min_latitude, max_latitude, longitude - d_longitude, longitude + d_longitude
+
+
+def cells_in_box(min_latitude, max_latitude, min_longitude, max_longitude):
+    rows = range(math.floor(min_latitude / GRID_DEGREES), math.floor(max_latitude / GRID_DEGREES) + 1)
+    columns = range(math.floor(min_longitude / GRID_DEGREES), math.floor(max_longitude / GRID_DEGREES) + 1)
+    if len(rows) * min(len(columns), GRID_COLUMNS) > MAX_CELLS:
+        return None
+    return {f'{row}:{column % GRID_COLUMNS}' for row in rows for column in columns}
+
+
+def cities_within(centers, radius_km):
+    """
+    Ids of the cities within `radius_km` of any of the `centers` (latitude, longitude) pairs.
+    """
+    city_ids = set()
+    for latitude, longitude in centers:
+        min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(latitude, longitude, radius_km)
+        candidates = City.objects.filter(latitude__range=(min_latitude, max_latitude))
+        cells = cells_in_box(min_latitude, max_latitude, min_longitude, max_longitude)
+        if cells is not None:
+            candidates = candidates.filter(grid_cell__in=cells)
+        for city_id, city_latitude, city_longitude in candidates.values_list('id', 'latitude', 'longitude'):
+            if haversine_km(latitude, longitude, city_latitude, city_longitude) <= radius_km:
+                city_ids.add(city_id)
+    return city_ids
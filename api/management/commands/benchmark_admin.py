@@ -0,0 +1,125 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.admin_scaling import CURSOR_VAR, encode_cursor
+from api.choices import JobApplicationStatus, PayRollChoice
+from api.models import CustomUser, Company, Skill, City, JobPost, JobApplication
+
+
+class Command(BaseCommand):
+    help = ('Times the JobPost and JobApplication admin changelists (first page, deep pages, search, filters), '
+            'optionally seeding a large synthetic dataset first. --seed writes to the database: dev only')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, metavar='JOBS',
+                            help='create JOBS synthetic job posts and as many applications first')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'], options['batch_size'])
+        user = CustomUser.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('needs a superuser to render the admin as')
+        job_post = JobPost.objects.order_by('created_at').select_related('company').first()
+        if job_post is None:
+            raise CommandError('no job posts, run with --seed')
+        skill = Skill.objects.filter(jobpost__isnull=False).first()
+        applicant = CustomUser.objects.filter(jobapplication__isnull=False).first()
+        cases = [
+            (JobPost, {}),
+            *self.middle_of(JobPost),
+            (JobPost, {'q': job_post.title[:6]}),
+            (JobPost, {'q': job_post.company.name[:8]}),
+            (JobPost, {'company__id__exact': job_post.company_id}),
+            (JobPost, {'skills__id__exact': skill.id} if skill else {}),
+            (JobApplication, {}),
+            *self.middle_of(JobApplication),
+            (JobApplication, {'q': applicant.email[:12]} if applicant else {}),
+            (JobApplication, {'job_post__company__id__exact': job_post.company_id}),
+        ]
+        factory = RequestFactory()
+        for model, params in cases:
+            model_admin = admin.site._registry[model]
+            elapsed = []
+            for _ in range(options['iterations']):
+                request = factory.get('/', params)
+                request.user = user
+                request.session = SessionStore()
+                request._messages = FallbackStorage(request)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = model_admin.changelist_view(request)
+                    response.render()
+                    elapsed.append(time.perf_counter() - started)
+            label = '&'.join(f'{key}={value}' for key, value in params.items()) or '(first page)'
+            self.stdout.write(f'{model.__name__:<15} {label[:60]:<60} status={response.status_code} '
+                              f'queries={len(queries)} best={min(elapsed) * 1000:8.1f}ms')
+
+    @staticmethod
+    def middle_of(model):
+        """
+        The page in the middle of the changelist, as a page number (OFFSET) and as a cursor (keyset).
+        """
+        total = model.objects.count()
+        per_page = admin.site._registry[model].list_per_page
+        page = max(1, total // per_page // 2)
+        # the cursor is the last row of the previous page
+        created_at, pk = model.objects.order_by('-created_at', '-pk').values_list('created_at', 'pk')[
+            max(0, (page - 1) * per_page - 1)]
+        return [(model, {'p': page}), (model, {CURSOR_VAR: encode_cursor(created_at, pk)})]
+
+    def seed(self, total, batch_size):
+        started = time.perf_counter()
+        user, created = CustomUser.objects.get_or_create(email='benchmark-admin@example.com',
+                                                         defaults={'is_staff': True, 'is_superuser': True,
+                                                                   'first_name': 'Benchmark'})
+        if created:
+            user.set_unusable_password()
+            user.save()
+        prefix = uuid.uuid4().hex[:6]
+        companies = Company.objects.bulk_create(
+            [Company(name=f'Company {prefix} {i}', email=f'hr{i}@{prefix}.example.com', mobile_number=str(i),
+                     logo='logo1.PNG') for i in range(max(1, total // 100))])
+        skills = Skill.objects.bulk_create([Skill(name=f'skill {prefix} {i}') for i in range(max(1, total // 1000))])
+        cities = City.objects.bulk_create([City(name=f'city {prefix} {i}') for i in range(max(1, total // 2000))])
+        applicants = CustomUser.objects.bulk_create(
+            [CustomUser(email=f'applicant{i}@{prefix}.example.com', first_name=f'First{i}', last_name=f'Last{i}')
+             for i in range(max(1, total // 10))])
+        expired_at = timezone.now() + timedelta(days=30)
+        for start in range(0, total, batch_size):
+            job_posts = []
+            for i in range(start, min(start + batch_size, total)):
+                job_post = JobPost(title=f'Job {prefix} {i}', description='', company=companies[i % len(companies)],
+                                   expired_at=expired_at, payroll_method=PayRollChoice.monthly.value[0],
+                                   pay_range_from=1000, pay_range_to=2000, alerts_matched=True)
+                job_post.set_annual_pay()
+                job_posts.append(job_post)
+            with transaction.atomic():
+                self.seed_batch(job_posts, start, skills, cities, applicants)
+        self.stdout.write(f'seeded {total} job posts and applications in {time.perf_counter() - started:.1f}s')
+
+    @staticmethod
+    def seed_batch(job_posts, start, skills, cities, applicants):
+        JobPost.objects.bulk_create(job_posts)
+        JobPost.skills.through.objects.bulk_create(
+            [JobPost.skills.through(jobpost_id=job_post.id, skill_id=skills[i % len(skills)].id)
+             for i, job_post in enumerate(job_posts, start)])
+        JobPost.cities.through.objects.bulk_create(
+            [JobPost.cities.through(jobpost_id=job_post.id, city_id=cities[i % len(cities)].id)
+             for i, job_post in enumerate(job_posts, start)])
+        JobApplication.objects.bulk_create(
+            [JobApplication(applicant=applicants[i % len(applicants)], job_post=job_post,
+                            status=JobApplicationStatus.candidate_applied.value[0])
+             for i, job_post in enumerate(job_posts, start)], ignore_conflicts=True)
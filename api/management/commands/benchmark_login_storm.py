@@ -0,0 +1,90 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+
+from api.models import CustomUser
+from api.passwords import hashing_pool
+
+
+class Command(BaseCommand):
+    help = ('Times the job list while idle, then during a storm of sign ins with wrong passwords, in this process. '
+            'Compare --executor thread (the pool) with --executor "" (hashing inline in the request threads). '
+            'Creates one user: dev only')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--executor', choices=['thread', 'process', ''], default=None,
+                            help='default: PASSWORD_HASHING_EXECUTOR')
+        parser.add_argument('--browsers', type=int, default=4, help='threads loading the job list')
+        parser.add_argument('--attackers', type=int, default=32, help='threads signing in')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--same-ip', action='store_true',
+                            help='send every sign in from one IP, to see the throttle refuse them before hashing')
+
+    def handle(self, *args, **options):
+        email = 'benchmark-login@example.com'
+        if not CustomUser.objects.filter(email=email).exists():
+            CustomUser.objects.create_user(email=email, password=uuid.uuid4().hex)
+        executor = settings.PASSWORD_HASHING_EXECUTOR if options['executor'] is None else options['executor']
+        # no throttling unless asked: the point is how much hashing the server takes on
+        limits = {} if options['same_ip'] else {'LOGIN_RATE_LIMIT_IP': 10 ** 9, 'LOGIN_RATE_LIMIT_EMAIL': 10 ** 9}
+        with override_settings(PASSWORD_HASHING_EXECUTOR=executor, **limits):
+            idle = self.run(options, attackers=0)
+            storm = self.run(options, attackers=options['attackers'])
+            pool = hashing_pool.stats()
+        self.stdout.write(f'hashing: {executor or "inline"}, {settings.PASSWORD_HASHING_WORKERS} worker(s), '
+                          f'max queue {settings.PASSWORD_HASHING_MAX_QUEUE}')
+        for label, result in (('idle', idle), ('storm', storm)):
+            latencies = sorted(result['browse'])
+            self.stdout.write(
+                f'{label:<6} job list: {len(latencies)} requests, p50={self.percentile(latencies, 50):7.1f}ms '
+                f'p95={self.percentile(latencies, 95):7.1f}ms | sign ins: {sum(result["logins"].values())} '
+                f'{dict(result["logins"])}')
+        self.stdout.write(f'pool: {pool}')
+
+    @staticmethod
+    def percentile(values, percent):
+        if not values:
+            return 0.0
+        if len(values) == 1:
+            return values[0]
+        return statistics.quantiles(values, n=100)[percent - 1]
+
+    def run(self, options, attackers):
+        deadline = time.perf_counter() + options['seconds']
+        result = {'browse': [], 'logins': {}}
+        lock = threading.Lock()
+
+        def browse():
+            client = Client()
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    client.get('/joblist/')
+                    with lock:
+                        result['browse'].append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+
+        def attack(n):
+            client = Client(REMOTE_ADDR='10.0.0.1' if options['same_ip'] else f'10.{n // 256 % 256}.{n % 256}.1')
+            try:
+                while time.perf_counter() < deadline:
+                    response = client.post('/signin/', {'email': f'storm{n}@example.com', 'password': 'wrong'})
+                    with lock:
+                        result['logins'][response.status_code] = result['logins'].get(response.status_code, 0) + 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=browse) for _ in range(options['browsers'])]
+        threads += [threading.Thread(target=attack, args=(n,)) for n in range(attackers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
@@ -0,0 +1,71 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.utils import timezone
+
+from api.choices import JobApplicationStatus, PayRollChoice
+from api.models import JobPost, Company
+
+TEMPLATES = ['api/job_list.html', 'api/application_list.html', 'api/save_list.html']
+
+
+class Command(BaseCommand):
+    help = 'Measures render time of the list templates with 5/50/500 rows, without touching the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[5, 50, 500])
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--template', dest='templates', action='append',
+                            help='template to render, may be repeated (default: every list template)')
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/joblist/')
+        request.user = AnonymousUser()
+        for template_name in options['templates'] or TEMPLATES:
+            template = get_template(template_name)
+            for rows in options['rows']:
+                context = self.build_context(rows)
+                # the first render fills the fragment cache (fresh ids), the rest show the steady state
+                started = time.perf_counter()
+                template.render(context, request)
+                cold = time.perf_counter() - started
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    template.render(context, request)
+                warm = (time.perf_counter() - started) / options['iterations']
+                self.stdout.write(f'{template_name:<28} rows={rows:<5} cold={cold * 1000:8.2f}ms '
+                                  f'warm={warm * 1000:8.2f}ms')
+
+    def build_context(self, rows):
+        now = timezone.now()
+        companies = [Company(id=uuid.uuid4(), name=f'Company {i}', email=f'hr{i}@example.com',
+                             mobile_number='9999999999', logo='logo1.PNG', modified_at=now)
+                     for i in range(rows)]
+        job_posts = []
+        for i in range(rows):
+            job_post = JobPost(id=uuid.uuid4(), title=f'Job {i}', company=companies[i], total_vacancies=1,
+                               created_at=now, modified_at=now, expired_at=now + timedelta(days=30),
+                               payroll_method=PayRollChoice.monthly.value[0],
+                               pay_range_from=1000, pay_range_to=2000)
+            job_post.applied_on = now
+            job_post.applied_status = JobApplicationStatus.candidate_applied.value[0]
+            job_post.saved_on = now
+            job_posts.append(job_post)
+        options = [{'id': uuid.uuid4(), 'name': f'Option {i}'} for i in range(rows)]
+        page_obj = Paginator(job_posts, max(rows, 1)).page(1)
+        return {
+            'job_posts': page_obj.object_list,
+            'page_obj': page_obj,
+            'skills': options,
+            'cities': options,
+            'companies': options,
+            'fragment_cache_timeout': settings.TEMPLATE_FRAGMENT_CACHE_TIMEOUT,
+            'user': None,
+        }
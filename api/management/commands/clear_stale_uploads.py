@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.uploads import clear_stale
+
+
+class Command(BaseCommand):
+    help = ('Removes the chunked uploads started longer than CHUNKED_UPLOAD_EXPIRY ago, and the parts of those left '
+            'unfinished')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, help='seconds, instead of CHUNKED_UPLOAD_EXPIRY')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'removed {clear_stale(options["max_age"])} stale upload(s)')
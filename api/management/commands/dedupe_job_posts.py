@@ -0,0 +1,45 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from api.dedup import index_job_posts, merge_duplicates, numpy
+from api.models import JobPost
+
+
+class Command(BaseCommand):
+    help = ('Computes the MinHash signatures of job posts in batches, oldest first, and flags every post that '
+            'near-duplicates an older post of its company. Posts already indexed are skipped unless --rebuild; '
+            '--merge then folds the flagged posts into their originals')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', action='append', type=uuid.UUID, default=[],
+                            help='company id, may be repeated')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='recompute the signatures already stored, needed after changing JOB_DEDUP_*')
+        parser.add_argument('--merge', action='store_true', help='merge the flagged posts into their originals')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        job_posts = JobPost.objects.all()
+        if options['company']:
+            job_posts = job_posts.filter(company_id__in=options['company'])
+        pending = job_posts if options['rebuild'] else job_posts.filter(signature__isnull=True)
+        pending = pending.order_by('created_at', 'id').only('id', 'title', 'description', 'company_id',
+                                                             'created_at', 'duplicate_of_id')
+        indexed = flagged = 0
+        last = None
+        while True:
+            page = pending if last is None else pending.filter(created_at__gte=last.created_at).exclude(
+                created_at=last.created_at, id__lte=last.id)
+            batch = list(page[:options['batch_size']])
+            if not batch:
+                break
+            flagged += len(index_job_posts(batch))
+            indexed += len(batch)
+            last = batch[-1]
+        self.stdout.write(f'indexed {indexed} job post(s) in {time.perf_counter() - started:.1f}s '
+                          f'({"numpy" if numpy else "pure python"} signatures), {flagged} duplicate(s) found')
+        if options['merge']:
+            self.stdout.write(f'merged {merge_duplicates(job_posts)} duplicate(s) into their originals')
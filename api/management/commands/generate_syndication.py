@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.syndication import SyndicationBusy, generate
+
+
+class Command(BaseCommand):
+    help = ('Writes the sitemaps and job feeds of the active job posts to SYNDICATION_ROOT, rewriting only the '
+            'shards whose posts changed since the last run. Meant to run every few minutes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='rewrite every file')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            written = generate(force=options['force'])
+        except SyndicationBusy as e:
+            raise CommandError(f'{e}, try again once it is done')
+        self.stdout.write(f'wrote {written} file(s) in {time.perf_counter() - started:.2f}s')
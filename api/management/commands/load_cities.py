@@ -0,0 +1,79 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.autocomplete import INDEXES
+from api.geo import grid_cell
+from api.models import City
+
+# column positions in a GeoNames dump (cities500.txt, cities15000.txt, ...)
+GEONAMES_NAME, GEONAMES_LATITUDE, GEONAMES_LONGITUDE = 1, 4, 5
+
+
+class Command(BaseCommand):
+    help = 'Loads city coordinates from a gazetteer file, creating missing cities and updating existing ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['geonames', 'csv'], default='geonames',
+                            help='geonames: tab separated GeoNames dump; csv: file with name,latitude,longitude '
+                                 'columns and a header row')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--update-only', action='store_true', help='do not create cities missing from the db')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = updated = 0
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as f:
+                batch = {}
+                for name, latitude, longitude in self.read(f, options['format']):
+                    batch[name] = (latitude, longitude)
+                    if len(batch) >= options['batch_size']:
+                        batch_created, batch_updated = self.load(batch, options['update_only'])
+                        created, updated = created + batch_created, updated + batch_updated
+                        batch = {}
+                if batch:
+                    batch_created, batch_updated = self.load(batch, options['update_only'])
+                    created, updated = created + batch_created, updated + batch_updated
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            raise CommandError(f'could not read {options["path"]}: {e!r}')
+        INDEXES['cities'].invalidate()
+        self.stdout.write(f'created {created} and updated {updated} cities in {time.perf_counter() - started:.1f}s')
+
+    @staticmethod
+    def read(f, file_format):
+        if file_format == 'csv':
+            for row in csv.DictReader(f):
+                yield row['name'].strip()[:250], float(row['latitude']), float(row['longitude'])
+        else:
+            for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                yield (row[GEONAMES_NAME].strip()[:250], float(row[GEONAMES_LATITUDE]),
+                       float(row[GEONAMES_LONGITUDE]))
+
+    @staticmethod
+    @transaction.atomic
+    def load(batch, update_only):
+        """
+        Upserts one batch with a select, a bulk_update and a bulk_create; the last row of a name wins.
+        """
+        existing = []
+        for city in City.objects.filter(name__in=list(batch)).only('id', 'name'):
+            coordinates = batch.pop(city.name, None)
+            if coordinates is None:
+                # matched only through a case insensitive collation
+                continue
+            city.latitude, city.longitude = coordinates
+            city.grid_cell = grid_cell(city.latitude, city.longitude)
+            existing.append(city)
+        City.objects.bulk_update(existing, ['latitude', 'longitude', 'grid_cell'])
+        if update_only:
+            return 0, len(existing)
+        new = [City(name=name, latitude=latitude, longitude=longitude, grid_cell=grid_cell(latitude, longitude))
+               for name, (latitude, longitude) in batch.items()]
+        City.objects.bulk_create(new, ignore_conflicts=True)
+        # rows skipped as conflicts (a name matched case insensitively, or loaded meanwhile) never got these ids
+        created = City.objects.filter(id__in=[city.id for city in new]).count()
+        return created, len(existing)
@@ -0,0 +1,65 @@
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from api.alerts import Criteria, JobDocument, SavedSearchIndex, match_new_jobs, send_alert_notifications
+
+
+class Command(BaseCommand):
+    help = 'Matches new job posts against saved searches and emails the matches, one email per user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='keep running, matching new jobs every INTERVAL seconds')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--benchmark', type=int, metavar='SEARCHES', default=0,
+                            help='percolate synthetic jobs against SEARCHES synthetic saved searches, no db access')
+        parser.add_argument('--jobs', type=int, default=10000, help='synthetic jobs for --benchmark')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['jobs'])
+        while True:
+            started = time.perf_counter()
+            jobs, matches = match_new_jobs(batch_size=options['batch_size'])
+            emails = send_alert_notifications()
+            self.stdout.write(f'matched {jobs} job(s), {matches} match(es), sent {emails} email(s) '
+                              f'in {time.perf_counter() - started:.2f}s')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def benchmark(self, total_searches, total_jobs):
+        rng = random.Random(0)
+        skills = [uuid.uuid4() for _ in range(2000)]
+        cities = [uuid.uuid4() for _ in range(500)]
+        companies = [uuid.uuid4() for _ in range(5000)]
+        words = [f'word{i}' for i in range(20000)]
+
+        def sample(values, most, least=0):
+            return frozenset(rng.sample(values, rng.randint(least, most)))
+
+        started = time.perf_counter()
+        index = SavedSearchIndex()
+        for _ in range(total_searches):
+            # like the job list form, a saved search names at least one skill
+            index.add(Criteria(uuid.uuid4(), uuid.uuid4(), sample(skills, 3, least=1), sample(cities, 2),
+                               sample(companies, 1) if rng.random() < 0.2 else frozenset(),
+                               rng.choice((None, True, False)),
+                               sample(words, 2) if rng.random() < 0.3 else frozenset(),
+                               Decimal(rng.randint(0, 20)) * 100000 if rng.random() < 0.3 else None))
+        build = time.perf_counter() - started
+
+        documents = [JobDocument(uuid.uuid4(), set(rng.sample(skills, 5)), set(rng.sample(cities, 2)),
+                                 rng.choice(companies), rng.random() < 0.5, frozenset(rng.sample(words, 150)),
+                                 Decimal(rng.randint(1, 30)) * 100000)
+                     for _ in range(total_jobs)]
+        started = time.perf_counter()
+        matches = sum(len(index.percolate(document)) for document in documents)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{total_searches} saved searches indexed in {build:.2f}s; '
+                          f'{total_jobs} jobs percolated in {elapsed:.2f}s '
+                          f'({total_jobs / elapsed:.0f} jobs/s, {matches / elapsed:.0f} matches/s, {matches} matches)')
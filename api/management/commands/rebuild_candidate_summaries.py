@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import CandidateSummary, CustomUser
+from api.summaries import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the activity summaries behind the candidate dashboards from the applications, saved jobs '
+            'and saved search matches. Only users with a summary are rebuilt unless --all or --email')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', action='append', default=[], help='user email, may be repeated')
+        parser.add_argument('--all', action='store_true', help='create the summaries of users without one too')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['email']:
+            applicant_ids = CustomUser.objects.filter(email__in=options['email']).values_list('id', flat=True)
+        elif options['all']:
+            applicant_ids = CustomUser.objects.values_list('id', flat=True)
+        else:
+            applicant_ids = CandidateSummary.objects.values_list('applicant_id', flat=True)
+        rebuilt = 0
+        for applicant_id in applicant_ids.order_by().iterator(chunk_size=1000):
+            rebuild(applicant_id)
+            rebuilt += 1
+        self.stdout.write(f'rebuilt {rebuilt} summary(ies) in {time.perf_counter() - started:.1f}s')
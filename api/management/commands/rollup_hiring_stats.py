@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.models import JobPost
+from api.rollups import floor_day, rebuild_day
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the hourly and daily hiring stats buckets of a range of UTC days from the job posts, '
+            'applications and saved jobs. Today is only rebuilt when --to is after it, since writes keep adding '
+            'to its buckets while it runs')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='from_date', help='first day, YYYY-MM-DD (default: the first job post)')
+        parser.add_argument('--to', dest='to_date', help='day after the last one, YYYY-MM-DD (default: today)')
+
+    def handle(self, *args, **options):
+        today = floor_day(timezone.now())
+        start, end = self.parse(options['from_date']), self.parse(options['to_date']) or today
+        if start is None:
+            first = JobPost.objects.aggregate(first=Min('created_at'))['first']
+            if first is None:
+                return self.stdout.write('no job posts, nothing to roll up')
+            start = floor_day(first)
+        started = time.perf_counter()
+        day, buckets = start, 0
+        while day < end:
+            buckets += rebuild_day(day)
+            day += timedelta(days=1)
+        self.stdout.write(f'rebuilt {(end - start).days} day(s), {buckets} bucket(s), '
+                          f'in {time.perf_counter() - started:.1f}s')
+
+    @staticmethod
+    def parse(value):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'invalid date "{value}", expected YYYY-MM-DD')
+        return datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
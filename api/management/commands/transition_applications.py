@@ -0,0 +1,63 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.applications import transition_applications, decline_remaining_applicants, filled_job_posts
+from api.choices import JobApplicationStatus, APPLICATION_STATUS_TRANSITIONS
+from api.models import JobApplication, JobPost
+
+
+class Command(BaseCommand):
+    help = ('Moves many job applications to another status at once, in batched UPDATEs. Either --to STATUS for '
+            'the applications matching --job/--company/--from, or --decline-filled to decline the waiting '
+            'applicants of every job (or of --job/--company) with as many accepted applications as vacancies')
+
+    def add_arguments(self, parser):
+        statuses = [status.value[0] for status in JobApplicationStatus]
+        action = parser.add_mutually_exclusive_group(required=True)
+        action.add_argument('--to', choices=statuses, help='new status')
+        action.add_argument('--decline-filled', action='store_true')
+        parser.add_argument('--from', dest='from_status', choices=statuses, help='only applications in this status')
+        parser.add_argument('--job', action='append', type=uuid.UUID, default=[],
+                            help='job post id, may be repeated')
+        parser.add_argument('--company', action='append', type=uuid.UUID, default=[],
+                            help='company id, may be repeated')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='only count the applications that would move')
+
+    def handle(self, *args, **options):
+        if options['to'] and not (options['job'] or options['company'] or options['from_status']):
+            raise CommandError('--to needs at least one of --job, --company or --from')
+        job_posts = JobPost.objects.all()
+        if options['job']:
+            job_posts = job_posts.filter(id__in=options['job'])
+        if options['company']:
+            job_posts = job_posts.filter(company_id__in=options['company'])
+        applications = JobApplication.objects.all()
+        if options['job'] or options['company']:
+            applications = applications.filter(job_post__in=job_posts.values('pk'))
+        if options['from_status']:
+            applications = applications.filter(status=options['from_status'])
+        started = time.perf_counter()
+        if options['dry_run']:
+            return self.dry_run(options, job_posts, applications)
+        if options['decline_filled']:
+            result = decline_remaining_applicants(job_posts, options['batch_size'])
+            status = JobApplicationStatus.company_declined.value[0]
+        else:
+            result = transition_applications(applications, options['to'], options['batch_size'])
+            status = options['to']
+        self.stdout.write(f'moved {result.updated} application(s) to {status} in {result.batches} batch(es), '
+                          f'skipped {result.skipped}, in {time.perf_counter() - started:.2f}s')
+
+    def dry_run(self, options, job_posts, applications):
+        status = options['to']
+        if options['decline_filled']:
+            applications = JobApplication.objects.filter(
+                job_post__in=filled_job_posts(job_posts).values('pk'),
+                status=JobApplicationStatus.candidate_applied.value[0])
+            status = JobApplicationStatus.company_declined.value[0]
+        sources = [source for source, targets in APPLICATION_STATUS_TRANSITIONS.items() if status in targets]
+        self.stdout.write(f'{applications.filter(status__in=sources).count()} of {applications.count()} '
+                          f'selected application(s) would move to {status}')
@@ -0,0 +1,90 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+@lru_cache(maxsize=4096)
+def file_etag(path, mtime_ns, size):
+    # keyed on mtime/size as well, so a replaced file is re-hashed instead of served with a stale etag
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+
+def is_immutable(path):
+    # uploaded files get a random, timestamped name (see api.upload_handlers), so a url never changes content
+    return path.startswith(tuple(settings.MEDIA_IMMUTABLE_PREFIXES))
+
+
+def is_private(path):
+    return path.startswith(tuple(settings.MEDIA_PRIVATE_PREFIXES))
+
+
+def can_read(user, path):
+    # private uploads are stored under <prefix>/<owner id hex>/ (api.upload_handlers)
+    if not user.is_authenticated:
+        return False
+    return user.is_staff or path.split('/')[1:2] == [user.id.hex]
+
+
+@require_safe
+def serve_media(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    private = is_private(path)
+    if private and not can_read(request.user, path):
+        # as if missing, so the names of other users' files are not confirmed
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = file_etag(full_path, stat.st_mtime_ns, stat.st_size)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if settings.MEDIA_SENDFILE_HEADER:
+            # let the front web server (nginx/apache) push the bytes; django only authorizes and sets headers
+            response = HttpResponse()
+            if settings.MEDIA_SENDFILE_HEADER.lower() == 'x-accel-redirect':
+                response[settings.MEDIA_SENDFILE_HEADER] = settings.MEDIA_SENDFILE_PREFIX + path
+            else:
+                response[settings.MEDIA_SENDFILE_HEADER] = full_path
+            content_type, encoding = mimetypes.guess_type(full_path)
+            response['Content-Type'] = content_type or 'application/octet-stream'
+        else:
+            # FileResponse hands the file object to wsgi.file_wrapper, which uses sendfile where available
+            response = FileResponse(open(full_path, 'rb'))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if private:
+        # revalidated on every use (a 304 when unchanged), so access is checked each time
+        response['Cache-Control'] = 'private, no-cache'
+        # uploads of users, shown to staff: never rendered as anything but the type of their extension
+        response['X-Content-Type-Options'] = 'nosniff'
+    elif is_immutable(path):
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+    return response
+
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from api.passwords import HashingOverloaded
+from api.routers import replica_reads_allowed
+
+PRIMARY_STICKY_COOKIE = 'primary_sticky_until'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets views with `use_read_replica = True` read from replicas on GET/HEAD. After a user writes
+    (apply, save, profile update, sign in...) their reads stay on the primary for
+    settings.REPLICA_STICKY_SECONDS so they see their own changes despite replication lag.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = replica_reads_allowed.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads_allowed.reset(token)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            sticky_until = int(time.time()) + settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(PRIMARY_STICKY_COOKIE, str(sticky_until),
+                                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if request.method in ('GET', 'HEAD') and getattr(view_class, 'use_read_replica', False) \
+                and not self.is_sticky(request):
+            replica_reads_allowed.set(True)
+
+    @staticmethod
+    def is_sticky(request):
+        try:
+            return int(request.COOKIES.get(PRIMARY_STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class HashingOverloadedMiddleware:
+    """
+    Answers 503 to any request whose password hash was refused by a full hashing pool (api.passwords): the Django
+    admin sign in, password changes, and any other view calling authenticate/set_password without handling it.
+    The candidate sign in and sign up views render the same message in their own page.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingOverloaded):
+            response = HttpResponse(exception.message, status=503, content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = HashingOverloaded.retry_after
+            return response
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.3 on 2026-10-18 23:48
+
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+
+PAYROLL_PERIODS_PER_YEAR = {'H': 2080, 'W': 52, 'M': 12, 'A': 1}
+
+
+def backfill_annual_pay(apps, schema_editor):
+    JobPost = apps.get_model('api', 'JobPost')
+    periods = Case(*[When(payroll_method=method, then=Value(count))
+                     for method, count in PAYROLL_PERIODS_PER_YEAR.items()], default=Value(1))
+    JobPost.objects.update(annual_pay_from=F('pay_range_from') * periods,
+                           annual_pay_to=F('pay_range_to') * periods)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobpost',
+            name='annual_pay_from',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='annual_pay_to',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(backfill_annual_pay, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='jobpost',
+            index=models.Index(fields=['annual_pay_to', 'expired_at'], name='jobpost_annual_pay_to_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobpost',
+            index=models.Index(fields=['annual_pay_from', 'expired_at'], name='jobpost_annual_pay_from_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.3 on 2026-10-18 23:54
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicates(apps, schema_editor):
+    # keep the earliest row of every (applicant, job_post) pair so the unique constraints can be added
+    for model_name in ('JobApplication', 'SavedJob'):
+        model = apps.get_model('api', model_name)
+        duplicates = model.objects.values('applicant_id', 'job_post_id').annotate(
+            total=Count('id')).filter(total__gt=1).order_by()
+        for duplicate in duplicates:
+            rows = model.objects.filter(applicant_id=duplicate['applicant_id'], job_post_id=duplicate['job_post_id'])
+            keep = rows.order_by('created_at').values_list('id', flat=True).first()
+            rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_jobpost_annual_pay'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='jobapplication',
+            constraint=models.UniqueConstraint(fields=('applicant', 'job_post'), name='unique_job_application'),
+        ),
+        migrations.AddConstraint(
+            model_name='savedjob',
+            constraint=models.UniqueConstraint(fields=('applicant', 'job_post'), name='unique_saved_job'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.0.3 on 2026-10-18 23:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def mark_existing_jobs_matched(apps, schema_editor):
+    # only posts created from now on should trigger alerts
+    JobPost = apps.get_model('api', 'JobPost')
+    JobPost.objects.update(alerts_matched=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_applicant_job_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=250)),
+                ('can_be_remote', models.BooleanField(blank=True, null=True)),
+                ('search', models.CharField(blank=True, max_length=250)),
+                ('min_salary', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL)),
+                ('cities', models.ManyToManyField(blank=True, to='api.city')),
+                ('companies', models.ManyToManyField(blank=True, to='api.company')),
+                ('skills', models.ManyToManyField(blank=True, to='api.skill')),
+            ],
+            options={
+                'verbose_name': 'Saved Searches',
+                'verbose_name_plural': 'Saved Searches',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='alerts_matched',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(mark_existing_jobs_matched, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='SavedSearchMatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('notified_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_matches', to='api.jobpost')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='api.savedsearch')),
+            ],
+            options={
+                'verbose_name': 'Saved Search Matches',
+                'verbose_name_plural': 'Saved Search Matches',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='savedsearchmatch',
+            constraint=models.UniqueConstraint(fields=('saved_search', 'job_post'), name='unique_saved_search_match'),
+        ),
+    ]
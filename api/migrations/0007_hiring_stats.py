@@ -0,0 +1,49 @@
+# Generated by Django 4.0.3 on 2026-10-19 00:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HiringStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('period', models.CharField(choices=[('H', 'Hourly'), ('D', 'Daily')], max_length=1)),
+                ('bucket_start', models.DateTimeField()),
+                ('applications', models.PositiveIntegerField(default=0)),
+                ('saves', models.PositiveIntegerField(default=0)),
+                ('accepted', models.PositiveIntegerField(default=0)),
+                ('declined', models.PositiveIntegerField(default=0)),
+                ('new_jobs', models.PositiveIntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hiring_stats', to='api.company')),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hiring_stats', to='api.jobpost')),
+            ],
+            options={
+                'verbose_name': 'Hiring Stats',
+                'verbose_name_plural': 'Hiring Stats',
+                'ordering': ('-bucket_start',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hiringstat',
+            index=models.Index(fields=['company', 'period', 'bucket_start'], name='hiringstat_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hiringstat',
+            index=models.Index(fields=['period', 'bucket_start'], name='hiringstat_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hiringstat',
+            constraint=models.UniqueConstraint(fields=('job_post', 'period', 'bucket_start'), name='unique_hiring_stat'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.0.3 on 2026-10-19 00:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_hiring_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobpost',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='api.jobpost'),
+        ),
+        migrations.CreateModel(
+            name='JobPostSignature',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('signature', models.BinaryField()),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.company')),
+                ('job_post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature', to='api.jobpost')),
+            ],
+            options={
+                'verbose_name': 'Job Post Signatures',
+                'verbose_name_plural': 'Job Post Signatures',
+            },
+        ),
+        migrations.CreateModel(
+            name='JobPostBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.company')),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dedup_buckets', to='api.jobpost')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='jobpostbucket',
+            index=models.Index(fields=['company', 'bucket'], name='jobpostbucket_company_idx'),
+        ),
+    ]
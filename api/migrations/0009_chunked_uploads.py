@@ -0,0 +1,32 @@
+# Generated by Django 4.0.3 on 2026-10-19 00:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_job_post_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('resume', 'Resume'), ('profile_picture', 'Profile Picture')], max_length=20)),
+                ('size', models.PositiveBigIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Chunked Uploads',
+                'verbose_name_plural': 'Chunked Uploads',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.0.3 on 2026-10-19 00:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('status_counts', models.JSONField(default=dict)),
+                ('saved', models.PositiveIntegerField(default=0)),
+                ('new_matches', models.PositiveIntegerField(default=0)),
+                ('matches_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('recent_changes', models.JSONField(default=list)),
+                ('expiring_saves', models.JSONField(default=list)),
+                ('recent_matches', models.JSONField(default=list)),
+                ('applicant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='activity_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Candidate Summaries',
+                'verbose_name_plural': 'Candidate Summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_candidate_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidatesummary',
+            name='rebuilt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
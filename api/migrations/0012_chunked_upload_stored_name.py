@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_candidate_summary_rebuilt_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='stored_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
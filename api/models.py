@@ -1,10 +1,12 @@
 import uuid
+from decimal import Decimal
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 from django.db import models
+from django.dispatch import Signal
 
-from api.choices import PayRollChoice, JobApplicationStatus
+from api.choices import PayRollChoice, JobApplicationStatus, RollupPeriod, UploadKind, PAYROLL_PERIODS_PER_YEAR
 from api.upload_handlers import company_logo, applicant_resume, applicant_profile_picture
 from strings import *
 
@@ -79,6 +81,11 @@ class CustomUser(AbstractUser):
         ordering = ('first_name',)
         verbose_name_plural = 'Users'
         verbose_name = 'User'
+        # prefix search in the admin
+        indexes = [
+            models.Index(fields=['first_name'], name='customuser_first_name_idx'),
+            models.Index(fields=['last_name'], name='customuser_last_name_idx'),
+        ]
 
 
 class Skill(BaseModel):
@@ -97,10 +104,28 @@ class Skill(BaseModel):
 class City(BaseModel):
     name = models.CharField(max_length=250, unique=True, db_index=True,
                             error_messages={"unique": CITY_EXISTS})
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # grid cell of the coordinates, the spatial index of radius searches (see api.geo)
+    grid_cell = models.CharField(max_length=20, null=True, blank=True, db_index=True, editable=False)
 
     def __str__(self):
         return self.name
 
+    def set_grid_cell(self):
+        from api.geo import grid_cell
+        if self.latitude is None or self.longitude is None:
+            self.grid_cell = None
+        else:
+            self.grid_cell = grid_cell(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.set_grid_cell()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'grid_cell'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ('name',)
         verbose_name_plural = 'Cities'
@@ -134,17 +159,101 @@ class JobPost(BaseModel):
     payroll_method = models.CharField(max_length=1, choices=[i.value for i in PayRollChoice])
     pay_range_from = models.DecimalField(decimal_places=2, max_digits=10)
     pay_range_to = models.DecimalField(decimal_places=2, max_digits=10)
+    # pay range normalized to a yearly amount so posts with different payroll methods can be compared
+    annual_pay_from = models.DecimalField(decimal_places=2, max_digits=14, default=0, editable=False)
+    annual_pay_to = models.DecimalField(decimal_places=2, max_digits=14, default=0, editable=False)
     can_be_remote = models.BooleanField(default=True, db_index=True)
     skills = models.ManyToManyField(Skill, blank=True)
     cities = models.ManyToManyField(City, blank=True)
+    # set once the post has been matched against saved searches, see api.alerts
+    alerts_matched = models.BooleanField(default=False, db_index=True, editable=False)
+    # the older post of the same company this one near-duplicates, see api.dedup
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='duplicates')
 
     def __str__(self):
         return f'{self.title}-({self.company.name})'
 
+    def clean(self):
+        # merge_duplicates folds a post into what it points at; a loop or a chain would lose applications
+        if self.duplicate_of_id and self.duplicate_of_id == self.id:
+            raise ValidationError({'duplicate_of': DUPLICATE_OF_ITSELF})
+        if self.duplicate_of_id and JobPost.objects.filter(id=self.duplicate_of_id,
+                                                           duplicate_of__isnull=False).exists():
+            raise ValidationError({'duplicate_of': DUPLICATE_OF_DUPLICATE})
+
+    def set_annual_pay(self):
+        periods = PAYROLL_PERIODS_PER_YEAR.get(self.payroll_method, 1)
+        self.annual_pay_from = Decimal(self.pay_range_from) * periods
+        self.annual_pay_to = Decimal(self.pay_range_to) * periods
+
+    def save(self, *args, **kwargs):
+        self.set_annual_pay()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'annual_pay_from', 'annual_pay_to'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ('-created_at',)
         verbose_name_plural = 'Job Posts'
         verbose_name = 'Job Posts'
+        indexes = [
+            models.Index(fields=['annual_pay_to', 'expired_at'], name='jobpost_annual_pay_to_idx'),
+            models.Index(fields=['annual_pay_from', 'expired_at'], name='jobpost_annual_pay_from_idx'),
+            # keyset paging in the admin
+            models.Index(fields=['created_at', 'id'], name='jobpost_created_idx'),
+        ]
+
+
+class JobPostSignature(BaseModel):
+    """
+    MinHash signature of a job post's title and description, maintained by api.dedup.
+    """
+    job_post = models.OneToOneField(JobPost, on_delete=models.CASCADE, related_name='signature')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='+')
+    signature = models.BinaryField()
+
+    class Meta:
+        verbose_name_plural = 'Job Post Signatures'
+        verbose_name = 'Job Post Signatures'
+
+
+class JobPostBucket(models.Model):
+    """
+    One band of a JobPostSignature hashed to a key: posts of a company sharing a key are duplicate candidates.
+    Not a BaseModel, there are JOB_DEDUP_BANDS rows per post and only the (company, bucket) index is read.
+    """
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='dedup_buckets')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='+')
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'bucket'], name='jobpostbucket_company_idx'),
+        ]
+
+
+# sent by ApplicantJobManager.add_for with: applicant_id, job_post_ids (the pairs it inserted)
+applicant_jobs_added = Signal()
+
+
+class ApplicantJobManager(models.Manager):
+    def add_for(self, applicant_id, job_post_ids, **fields):
+        """
+        Links the applicant to every job in `job_post_ids` with a single INSERT that skips pairs which already
+        exist (INSERT IGNORE / ON CONFLICT DO NOTHING), relying on the unique (applicant, job_post) constraint
+        instead of a read-then-write that races on double submits. Returns the ids of the jobs it linked.
+        """
+        rows = self.bulk_create([self.model(applicant_id=applicant_id, job_post_id=job_post_id, **fields)
+                                 for job_post_id in job_post_ids], ignore_conflicts=True)
+        if not rows:
+            return []
+        # the insert does not report which pairs it skipped, but only the rows it wrote carry the ids generated here
+        added = list(self.filter(id__in=[row.id for row in rows]).values_list('job_post_id', flat=True))
+        if added:
+            applicant_jobs_added.send(sender=self.model, applicant_id=applicant_id, job_post_ids=added)
+        return added
 
 
 class JobApplication(BaseModel):
@@ -153,6 +262,8 @@ class JobApplication(BaseModel):
     status = models.CharField(max_length=3, choices=[i.value for i in JobApplicationStatus],
                               default=JobApplicationStatus.candidate_applied.value[0], db_index=True)
 
+    objects = ApplicantJobManager()
+
     def __str__(self):
         return f'{self.applicant.email}-({self.job_post.title})'
 
@@ -160,13 +271,123 @@ class JobApplication(BaseModel):
         ordering = ('-created_at',)
         verbose_name_plural = 'Job Applications'
         verbose_name = 'Job Applications'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='jobapplication_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['applicant', 'job_post'], name='unique_job_application'),
+        ]
 
 
 class SavedJob(BaseModel):
     applicant = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='saved_jobs')
 
+    objects = ApplicantJobManager()
+
     class Meta:
         ordering = ('-created_at',)
         verbose_name_plural = 'Saved Jobs'
         verbose_name = 'Saved Jobs'
+        constraints = [
+            models.UniqueConstraint(fields=['applicant', 'job_post'], name='unique_saved_job'),
+        ]
+
+
+class SavedSearch(BaseModel):
+    applicant = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=250)
+    skills = models.ManyToManyField(Skill, blank=True)
+    cities = models.ManyToManyField(City, blank=True)
+    companies = models.ManyToManyField(Company, blank=True)
+    can_be_remote = models.BooleanField(null=True, blank=True)
+    search = models.CharField(max_length=250, blank=True)
+    min_salary = models.DecimalField(decimal_places=2, max_digits=14, null=True, blank=True)
+    is_active = models.BooleanField(default=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.applicant.email}-({self.name})'
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name_plural = 'Saved Searches'
+        verbose_name = 'Saved Searches'
+
+
+class SavedSearchMatch(BaseModel):
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches')
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='saved_search_matches')
+    notified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name_plural = 'Saved Search Matches'
+        verbose_name = 'Saved Search Matches'
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'job_post'], name='unique_saved_search_match'),
+        ]
+
+
+class HiringStat(BaseModel):
+    """
+    Counters of one job post over one UTC hour or day, maintained by api.rollups.
+    """
+    period = models.CharField(max_length=1, choices=[i.value for i in RollupPeriod])
+    bucket_start = models.DateTimeField()
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='hiring_stats')
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='hiring_stats')
+    applications = models.PositiveIntegerField(default=0)
+    saves = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    declined = models.PositiveIntegerField(default=0)
+    new_jobs = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('-bucket_start',)
+        verbose_name_plural = 'Hiring Stats'
+        verbose_name = 'Hiring Stats'
+        indexes = [
+            models.Index(fields=['company', 'period', 'bucket_start'], name='hiringstat_company_idx'),
+            models.Index(fields=['period', 'bucket_start'], name='hiringstat_bucket_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['job_post', 'period', 'bucket_start'], name='unique_hiring_stat'),
+        ]
+
+
+class CandidateSummary(BaseModel):
+    """
+    What the dashboard of one applicant shows, maintained by api.summaries: applications per status, saved jobs,
+    matches not yet seen, and the latest entries of each list (job ids, titles and dates as JSON).
+    """
+    applicant = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='activity_summary')
+    status_counts = models.JSONField(default=dict)
+    saved = models.PositiveIntegerField(default=0)
+    new_matches = models.PositiveIntegerField(default=0)
+    matches_seen_at = models.DateTimeField(null=True, blank=True)
+    # events committed before this were counted by the rebuild, see api.summaries.apply_events
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+    recent_changes = models.JSONField(default=list)
+    expiring_saves = models.JSONField(default=list)
+    recent_matches = models.JSONField(default=list)
+
+    class Meta:
+        verbose_name_plural = 'Candidate Summaries'
+        verbose_name = 'Candidate Summaries'
+
+
+class ChunkedUpload(BaseModel):
+    """
+    A resume or profile picture being uploaded in chunks, see api.uploads. The bytes received so far are in
+    settings.CHUNKED_UPLOAD_DIR.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='chunked_uploads')
+    kind = models.CharField(max_length=20, choices=[i.value for i in UploadKind])
+    size = models.PositiveBigIntegerField()
+    # name of the stored file once complete; kept until expiry so a retried last chunk still gets its url
+    stored_name = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name_plural = 'Chunked Uploads'
+        verbose_name = 'Chunked Uploads'
@@ -0,0 +1,146 @@
+"""
+Password hashing off the request threads, and sign in/sign up throttling.
+
+PBKDF2 is deliberately slow: run inline, a burst of sign ins occupies every worker thread and core, and pages stop
+being served. PooledPBKDF2PasswordHasher (first in settings.PASSWORD_HASHERS, so create_user, set_password and
+authenticate all use it) computes the hash on a pool of settings.PASSWORD_HASHING_WORKERS threads or processes:
+at most that many hashes run at once, whatever the number of sign ins. With more than
+settings.PASSWORD_HASHING_MAX_QUEUE hashes waiting for the pool, a new one is refused with HashingOverloaded
+instead of queueing. Hashes are byte for byte those of Django's PBKDF2PasswordHasher.
+
+The candidate sign in and sign up views answer HashingOverloaded with a 503 page of their own, and
+api.middleware.HashingOverloadedMiddleware turns it into a 503 on every other request (admin sign in, password
+changes). Management commands (createsuperuser, changepassword) hash on the pool of their own process, where
+nothing else waits, so they are never refused.
+
+Before any hashing, attempts are counted per IP and per email in sliding windows (api.caching.rate_limit) in the
+process-local 'throttle' cache; an attempt over a limit is turned away without touching the database or the pool.
+"""
+import base64
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.crypto import pbkdf2
+
+from api.caching import rate_limit
+
+from strings import LOGIN_BUSY
+
+logger = logging.getLogger(__name__)
+
+EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+
+class HashingOverloaded(Exception):
+    # read by the views showing `message` of the errors of a sign up
+    message = LOGIN_BUSY
+    # seconds, sent as Retry-After
+    retry_after = 5
+
+
+def pbkdf2_base64(password, salt, iterations, digest_name):
+    # module level, so a process pool can pickle it
+    return base64.b64encode(pbkdf2(password, salt, iterations, digest=getattr(hashlib, digest_name))).decode(
+        'ascii').strip()
+
+
+class HashingPool:
+    """
+    The executor hashes run on, created on first use, with counters of what went through it in this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.executor_kind = None
+        self.pending = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def get_executor(self, kind):
+        if self.executor_kind != kind:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+            self.executor = EXECUTORS[kind](max_workers=settings.PASSWORD_HASHING_WORKERS)
+            self.executor_kind = kind
+        return self.executor
+
+    def run(self, function, *args):
+        kind = settings.PASSWORD_HASHING_EXECUTOR
+        if not kind:
+            return function(*args)
+        with self.lock:
+            queued = self.pending - settings.PASSWORD_HASHING_WORKERS
+            if queued >= settings.PASSWORD_HASHING_MAX_QUEUE:
+                self.rejected += 1
+                logger.warning('password hashing overloaded: %d hashes waiting, %d refused so far', queued,
+                               self.rejected)
+                raise HashingOverloaded
+            self.pending += 1
+            self.peak_queued = max(self.peak_queued, queued + 1)
+            executor = self.get_executor(kind)
+        try:
+            return executor.submit(function, *args).result()
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'executor': settings.PASSWORD_HASHING_EXECUTOR or 'inline',
+                'workers': settings.PASSWORD_HASHING_WORKERS,
+                'running': min(self.pending, settings.PASSWORD_HASHING_WORKERS),
+                'queued': max(0, self.pending - settings.PASSWORD_HASHING_WORKERS),
+                'peak_queued': self.peak_queued,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+hashing_pool = HashingPool()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2PasswordHasher computing its hashes on the hashing pool; same algorithm name and output, so existing
+    passwords keep working. Replaces PBKDF2PasswordHasher in PASSWORD_HASHERS rather than joining it, as hashers
+    are looked up by algorithm name.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash = hashing_pool.run(pbkdf2_base64, password, salt, iterations, self.digest().name)
+        return '%s$%d$%s$%s' % (self.algorithm, iterations, salt, hash)
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR')
+
+
+def email_key(email):
+    # emails are user input: hashed into a safe, bounded cache key
+    return hashlib.md5(email.strip().lower().encode()).hexdigest()
+
+
+def throttle_sign_in(request, email):
+    """
+    Counts a sign in attempt for the client's IP and for `email`. Returns the seconds to wait before the next
+    one is accepted, 0 when this one may go ahead.
+    """
+    window = settings.LOGIN_RATE_LIMIT_WINDOW
+    return (rate_limit(f'signin:ip:{client_ip(request)}', settings.LOGIN_RATE_LIMIT_IP, window, using='throttle') or
+            rate_limit(f'signin:email:{email_key(email)}', settings.LOGIN_RATE_LIMIT_EMAIL, window,
+                       using='throttle'))
+
+
+def throttle_sign_up(request):
+    return rate_limit(f'signup:ip:{client_ip(request)}', settings.SIGNUP_RATE_LIMIT_IP,
+                      settings.LOGIN_RATE_LIMIT_WINDOW, using='throttle')
@@ -0,0 +1,192 @@
+"""
+Hiring analytics rollups.
+
+HiringStat keeps counters per job post (and its company) per UTC hour and per UTC day. Writes add to them as they
+happen, once their transaction commits (see the receivers in api.signals); the rollup_hiring_stats command
+rebuilds any range of days from the source tables. A date range is answered from the day buckets it fully covers
+plus the hour buckets of the partial days at either end, so reports never scan JobApplication itself.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction, DatabaseError
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncHour
+
+from api.choices import JobApplicationStatus, RollupPeriod
+from api.models import HiringStat, JobApplication, JobPost, SavedJob
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('applications', 'saves', 'accepted', 'declined', 'new_jobs')
+HOUR = RollupPeriod.hourly.value[0]
+DAY = RollupPeriod.daily.value[0]
+# counter moved by an application reaching the status
+STATUS_COUNTERS = {
+    JobApplicationStatus.company_accepted.value[0]: 'accepted',
+    JobApplicationStatus.company_declined.value[0]: 'declined',
+}
+
+
+def floor_hour(when):
+    return when.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(when):
+    return floor_hour(when).replace(hour=0)
+
+
+def ceil_hour(when):
+    hour = floor_hour(when)
+    return hour if hour == when else hour + timedelta(hours=1)
+
+
+def ceil_day(when):
+    day = floor_day(when)
+    return day if day == when else day + timedelta(days=1)
+
+
+def record(counter, job_post_counts, when):
+    """
+    Adds {job_post_id: n} to `counter` in the hour and day buckets containing `when`, once the current transaction
+    commits.
+    """
+    job_post_counts = {job_post_id: n for job_post_id, n in job_post_counts.items() if n}
+    if job_post_counts:
+        transaction.on_commit(lambda: apply_counts(counter, job_post_counts, when))
+
+
+def apply_counts(counter, job_post_counts, when):
+    try:
+        companies = dict(JobPost.objects.filter(id__in=list(job_post_counts)).values_list('id', 'company_id'))
+        increments = {}
+        for job_post_id, n in job_post_counts.items():
+            if job_post_id in companies:
+                increments[(HOUR, floor_hour(when), job_post_id, companies[job_post_id])] = {counter: n}
+                increments[(DAY, floor_day(when), job_post_id, companies[job_post_id])] = {counter: n}
+        add_to_buckets(increments)
+    except DatabaseError:
+        # reports lag until the next rebuild rather than failing the write that was counted
+        logger.exception('could not update the hiring stats')
+
+
+@transaction.atomic
+def add_to_buckets(increments):
+    """
+    `increments`: {(period, bucket_start, job_post_id, company_id): {counter: n}}. Creates the missing buckets,
+    then adds to each with an UPDATE, so concurrent writers never lose a count.
+    """
+    HiringStat.objects.bulk_create([
+        HiringStat(period=period, bucket_start=bucket_start, job_post_id=job_post_id, company_id=company_id)
+        for period, bucket_start, job_post_id, company_id in increments], ignore_conflicts=True)
+    for (period, bucket_start, job_post_id, _), counts in increments.items():
+        HiringStat.objects.filter(period=period, bucket_start=bucket_start, job_post_id=job_post_id).update(
+            **{counter: F(counter) + n for counter, n in counts.items()})
+
+
+def bucket_filter(start, end):
+    """
+    The buckets adding up to [start, end), widened to whole hours: day buckets for the whole days, hour buckets
+    for the rest.
+    """
+    start, end = floor_hour(start), ceil_hour(end)
+    first_day, last_day = ceil_day(start), floor_day(end)
+    if first_day >= last_day:
+        return Q(period=HOUR, bucket_start__gte=start, bucket_start__lt=end)
+    return (Q(period=DAY, bucket_start__gte=first_day, bucket_start__lt=last_day) |
+            Q(period=HOUR, bucket_start__gte=start, bucket_start__lt=first_day) |
+            Q(period=HOUR, bucket_start__gte=last_day, bucket_start__lt=end))
+
+
+def stats(start, end, company_id=None, job_post_id=None):
+    qs = HiringStat.objects.filter(bucket_filter(start, end)).order_by()
+    if company_id:
+        qs = qs.filter(company_id=company_id)
+    if job_post_id:
+        qs = qs.filter(job_post_id=job_post_id)
+    return qs
+
+
+def with_rate(row):
+    # share of the applications of the range that were accepted
+    row['acceptance_rate'] = round(row['accepted'] / row['applications'], 4) if row['applications'] else None
+    return row
+
+
+def summarize(start, end, group_by=None, **filters):
+    """
+    Totals of every counter over [start, end); with `group_by` ('company' or 'job_post') one row per group,
+    busiest first.
+    """
+    sums = {counter: Coalesce(Sum(counter), 0) for counter in COUNTERS}
+    qs = stats(start, end, **filters)
+    if group_by is None:
+        return with_rate(qs.aggregate(**sums))
+    names = {'company': 'company__name', 'job_post': 'job_post__title'}
+    rows = qs.values(f'{group_by}_id', names[group_by]).annotate(**sums).order_by('-applications')
+    return [with_rate(row) for row in rows]
+
+
+def series(start, end, period, **filters):
+    """
+    One row per `period` bucket of [start, end) (rounded out to whole buckets), gaps filled with zeros.
+    """
+    step = timedelta(hours=1) if period == HOUR else timedelta(days=1)
+    start, end = (floor_hour(start), ceil_hour(end)) if period == HOUR else (floor_day(start), ceil_day(end))
+    qs = HiringStat.objects.filter(period=period, bucket_start__gte=start, bucket_start__lt=end).order_by()
+    for field, value in filters.items():
+        if value:
+            qs = qs.filter(**{field: value})
+    found = {row['bucket_start']: row for row in
+             qs.values('bucket_start').annotate(**{counter: Sum(counter) for counter in COUNTERS})}
+    rows = []
+    bucket_start = start
+    while bucket_start < end:
+        rows.append(with_rate(found.get(bucket_start) or {'bucket_start': bucket_start, **dict.fromkeys(COUNTERS, 0)}))
+        bucket_start += step
+    return rows
+
+
+def source_counts(start, end):
+    """
+    (counter, hour, job_post_id, company_id, n) from the source tables for [start, end). Accepted and declined
+    come from each application's current status at its modified_at: a decision later changed again is only
+    counted as the last one.
+    """
+    def grouped(qs, time_field, job_post_field, company_field):
+        return qs.filter(**{f'{time_field}__gte': start, f'{time_field}__lt': end}).annotate(
+            hour=TruncHour(time_field, tzinfo=dt_timezone.utc)).values_list(
+            'hour', job_post_field, company_field).annotate(n=Count('pk')).order_by()
+
+    for counter, qs, job_post_field, company_field in (
+            ('applications', JobApplication.objects, 'job_post_id', 'job_post__company_id'),
+            ('saves', SavedJob.objects, 'job_post_id', 'job_post__company_id'),
+            ('new_jobs', JobPost.objects, 'id', 'company_id')):
+        for hour, job_post_id, company_id, n in grouped(qs, 'created_at', job_post_field, company_field):
+            yield counter, hour, job_post_id, company_id, n
+    for status, counter in STATUS_COUNTERS.items():
+        for hour, job_post_id, company_id, n in grouped(JobApplication.objects.filter(status=status), 'modified_at',
+                                                        'job_post_id', 'job_post__company_id'):
+            yield counter, hour, job_post_id, company_id, n
+
+
+def rebuild_day(day):
+    """
+    Replaces the hour and day buckets of the UTC day starting at `day` with counts from the source tables.
+    Returns the number of buckets written.
+    """
+    end = day + timedelta(days=1)
+    hourly = defaultdict(Counter)
+    daily = defaultdict(Counter)
+    for counter, hour, job_post_id, company_id, n in source_counts(day, end):
+        hourly[(hour, job_post_id, company_id)][counter] += n
+        daily[(day, job_post_id, company_id)][counter] += n
+    buckets = [HiringStat(period=period, bucket_start=bucket_start, job_post_id=job_post_id, company_id=company_id,
+                          **counts)
+               for period, rows in ((HOUR, hourly), (DAY, daily))
+               for (bucket_start, job_post_id, company_id), counts in rows.items()]
+    with transaction.atomic():
+        HiringStat.objects.filter(bucket_start__gte=day, bucket_start__lt=end).delete()
+        HiringStat.objects.bulk_create(buckets, batch_size=1000)
+    return len(buckets)
@@ -0,0 +1,45 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+# set by api.middleware.ReplicaRoutingMiddleware for the duration of a read-only view
+replica_reads_allowed = ContextVar('replica_reads_allowed', default=False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads of views flagged with `use_read_replica` to one of settings.DATABASE_REPLICAS,
+    everything else (writes, admin, views that write) goes to the primary `default` database.
+    """
+
+    def db_for_read(self, model, **hints):
+        # sessions and users are read on every request; a lagging replica would log people out right after sign in
+        if model._meta.label in ('sessions.Session', settings.AUTH_USER_MODEL):
+            return 'default'
+        if settings.DATABASE_REPLICAS and replica_reads_allowed.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def close_unusable_connections(**kwargs):
+    """
+    Health check for persistent connections (CONN_MAX_AGE): a pooled connection the server has dropped
+    is closed at the start of the request so the first query reconnects instead of failing.
+    """
+    if not settings.DATABASE_HEALTH_CHECKS:
+        return
+    for conn in connections.all():
+        if conn.connection is not None and not conn.in_atomic_block and not conn.is_usable():
+            conn.close()
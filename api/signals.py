@@ -0,0 +1,219 @@
+from collections import defaultdict
+
+from django.core.signals import request_started
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api import dedup, rollups, summaries
+from api.alerts import saved_searches_matched
+from api.applications import applications_status_changed
+from api.autocomplete import INDEXES, INDEX_BY_MODEL
+from api.caching import invalidate_tags
+from api.models import Skill, City, Company, JobPost, JobApplication, SavedJob, applicant_jobs_added
+from api.routers import close_unusable_connections
+
+request_started.connect(close_unusable_connections, dispatch_uid='close_unusable_connections')
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=Company)
+def autocomplete_entry_saved(sender, instance, **kwargs):
+    INDEX_BY_MODEL[sender].upsert(instance.id, instance.name)
+
+
+@receiver(post_delete, sender=Skill)
+@receiver(post_delete, sender=City)
+@receiver(post_delete, sender=Company)
+def autocomplete_entry_deleted(sender, instance, **kwargs):
+    INDEX_BY_MODEL[sender].remove(instance.id)
+
+
+@receiver(m2m_changed, sender=JobPost.skills.through)
+@receiver(m2m_changed, sender=JobPost.cities.through)
+def job_post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    index = INDEXES['skills'] if sender is JobPost.skills.through else INDEXES['cities']
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse or action == 'post_clear':
+        index.invalidate()
+    elif instance.expired_at >= timezone.now():
+        index.adjust(pk_set, 1 if action == 'post_add' else -1)
+
+
+@receiver(post_save, sender=JobPost)
+def job_post_saved(sender, instance, created, **kwargs):
+    is_active = instance.expired_at >= timezone.now()
+    if created:
+        if is_active:
+            INDEXES['companies'].adjust([instance.company_id], 1)
+        return
+    previous = getattr(instance, '_previous_job_post', None)
+    if previous is None:
+        INDEXES['companies'].invalidate()
+        return
+    # only a change of company, or a post expiring/reopening, moves the counts
+    previous_company_id, previous_expired_at = previous
+    was_active = previous_expired_at >= timezone.now()
+    if (previous_company_id, was_active) == (instance.company_id, is_active):
+        return
+    if was_active:
+        INDEXES['companies'].adjust([previous_company_id], -1)
+    if is_active:
+        INDEXES['companies'].adjust([instance.company_id], 1)
+    if was_active != is_active:
+        delta = 1 if is_active else -1
+        INDEXES['skills'].adjust(instance.skills.values_list('id', flat=True), delta)
+        INDEXES['cities'].adjust(instance.cities.values_list('id', flat=True), delta)
+
+
+@receiver(post_delete, sender=JobPost)
+def job_post_deleted(sender, instance, **kwargs):
+    for index in INDEXES.values():
+        index.invalidate()
+
+
+def job_post_tags(job_post, company_ids=()):
+    tags = {'jobs:all', f'jobs:company:{job_post.company_id}'}
+    tags.update(f'jobs:company:{company_id}' for company_id in company_ids)
+    tags.update(f'jobs:skill:{skill_id}' for skill_id in job_post.skills.values_list('id', flat=True))
+    tags.update(f'jobs:city:{city_id}' for city_id in job_post.cities.values_list('id', flat=True))
+    return tags
+
+
+@receiver(pre_save, sender=JobPost)
+def remember_previous_job_post(sender, instance, **kwargs):
+    # (company_id, expired_at) before the save, also read by job_post_saved
+    if not instance._state.adding:
+        instance._previous_job_post = JobPost.objects.filter(id=instance.id).values_list(
+            'company_id', 'expired_at').first()
+        instance._previous_company_ids = [instance._previous_job_post[0]] if instance._previous_job_post else []
+
+
+@receiver(post_save, sender=JobPost)
+def invalidate_saved_job_post(sender, instance, **kwargs):
+    invalidate_tags(job_post_tags(instance, getattr(instance, '_previous_company_ids', ())))
+
+
+@receiver(pre_delete, sender=JobPost)
+def invalidate_deleted_job_post(sender, instance, **kwargs):
+    # the skill/city links are gone by post_delete
+    invalidate_tags(job_post_tags(instance))
+
+
+@receiver(m2m_changed, sender=JobPost.skills.through)
+@receiver(m2m_changed, sender=JobPost.cities.through)
+def invalidate_job_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # a skill/city gained or lost jobs: its own tag, and the lists of those jobs
+        name = 'skill' if isinstance(instance, Skill) else 'city'
+        invalidate_tags({'jobs:all', f'jobs:{name}:{instance.id}'} |
+                        {f'jobs:company:{company_id}' for company_id in
+                         JobPost.objects.filter(id__in=pk_set or ()).values_list('company_id', flat=True)})
+        return
+    name = 'skill' if sender is JobPost.skills.through else 'city'
+    if action == 'pre_clear':
+        pk_set = (instance.skills if name == 'skill' else instance.cities).values_list('id', flat=True)
+    invalidate_tags({'jobs:all', f'jobs:company:{instance.company_id}'} | {f'jobs:{name}:{pk}' for pk in pk_set})
+
+
+# hiring stats (api.rollups)
+APPLICANT_JOB_COUNTERS = {JobApplication: 'applications', SavedJob: 'saves'}
+
+
+@receiver(post_save, sender=JobPost)
+def count_new_job_post(sender, instance, created, **kwargs):
+    if created:
+        rollups.record('new_jobs', {instance.id: 1}, instance.created_at)
+
+
+@receiver(applicant_jobs_added, sender=JobApplication)
+@receiver(applicant_jobs_added, sender=SavedJob)
+def count_applicant_jobs_added(sender, job_post_ids, **kwargs):
+    rollups.record(APPLICANT_JOB_COUNTERS[sender], {job_post_id: 1 for job_post_id in job_post_ids}, timezone.now())
+
+
+@receiver(pre_save, sender=JobApplication)
+def remember_application_status(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._previous_status = JobApplication.objects.filter(id=instance.id).values_list(
+            'status', flat=True).first()
+
+
+@receiver(post_save, sender=JobApplication)
+@receiver(post_save, sender=SavedJob)
+def count_applicant_job_saved(sender, instance, created, **kwargs):
+    if created:
+        rollups.record(APPLICANT_JOB_COUNTERS[sender], {instance.job_post_id: 1}, instance.created_at)
+    elif sender is JobApplication and instance.status != getattr(instance, '_previous_status', instance.status):
+        counter = rollups.STATUS_COUNTERS.get(instance.status)
+        if counter:
+            rollups.record(counter, {instance.job_post_id: 1}, instance.modified_at)
+
+
+@receiver(applications_status_changed)
+def count_status_changes(sender, status, job_post_counts, **kwargs):
+    counter = rollups.STATUS_COUNTERS.get(status)
+    if counter:
+        rollups.record(counter, job_post_counts, timezone.now())
+
+
+# near-duplicate job posts (api.dedup)
+@receiver(post_save, sender=JobPost)
+def index_job_post_text(sender, instance, **kwargs):
+    dedup.index_job_post(instance)
+
+
+# candidate dashboards (api.summaries)
+@receiver(applicant_jobs_added, sender=JobApplication)
+@receiver(applicant_jobs_added, sender=SavedJob)
+def summarize_applicant_jobs_added(sender, applicant_id, job_post_ids, **kwargs):
+    if sender is JobApplication:
+        events = [summaries.Event('applied', job_post_id, summaries.APPLIED) for job_post_id in job_post_ids]
+    else:
+        events = [summaries.Event('saved', job_post_id) for job_post_id in job_post_ids]
+    summaries.record({applicant_id: events})
+
+
+@receiver(post_save, sender=JobApplication)
+@receiver(post_save, sender=SavedJob)
+def summarize_applicant_job_saved(sender, instance, created, **kwargs):
+    if created and sender is JobApplication:
+        event = summaries.Event('applied', instance.job_post_id, instance.status, when=instance.created_at)
+    elif created:
+        event = summaries.Event('saved', instance.job_post_id)
+    elif sender is JobApplication and instance.status != getattr(instance, '_previous_status', instance.status):
+        event = summaries.Event('status', instance.job_post_id, instance.status, instance._previous_status,
+                                when=instance.modified_at)
+    else:
+        return
+    summaries.record({instance.applicant_id: [event]})
+
+
+@receiver(post_delete, sender=JobApplication)
+@receiver(post_delete, sender=SavedJob)
+def summarize_applicant_job_deleted(sender, instance, **kwargs):
+    if sender is JobApplication:
+        event = summaries.Event('withdrawn', instance.job_post_id, previous=instance.status)
+    else:
+        event = summaries.Event('unsaved', instance.job_post_id)
+    summaries.record({instance.applicant_id: [event]})
+
+
+@receiver(applications_status_changed)
+def summarize_status_changes(sender, status, applications, **kwargs):
+    events = defaultdict(list)
+    for _, applicant_id, job_post_id, previous in applications:
+        events[applicant_id].append(summaries.Event('status', job_post_id, status, previous))
+    summaries.record(events)
+
+
+@receiver(saved_searches_matched)
+def summarize_matches(sender, matches, **kwargs):
+    events = defaultdict(list)
+    for saved_search_id, applicant_id, job_post_id in matches:
+        events[applicant_id].append(summaries.Event('matched', job_post_id, search=saved_search_id))
+    summaries.record(events)
@@ -0,0 +1,210 @@
+"""
+Per-applicant activity summaries behind the candidate dashboard.
+
+CandidateSummary keeps, in one row per applicant, everything the dashboard shows: their applications per status,
+how many jobs they saved, how many matches of their saved searches they have not seen, and the latest
+settings.CANDIDATE_SUMMARY_ENTRIES entries of each list (status changes, saved jobs expiring soonest, matches).
+Applying, saving, withdrawing, status changes and new matches change it as they happen, once their transaction
+commits (see the receivers in api.signals), so a dashboard is one lookup on the applicant's id instead of counting
+and sorting their applications, saves and matches. Only existing rows are changed: a row is built from the source
+tables on the applicant's first visit, and the rebuild_candidate_summaries command recomputes rows that drifted.
+"""
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, DatabaseError
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.choices import JobApplicationStatus
+from api.models import CandidateSummary, JobApplication, JobPost, SavedJob, SavedSearch, SavedSearchMatch
+
+logger = logging.getLogger(__name__)
+
+# kind: 'applied' (status), 'status' (status, previous), 'withdrawn' (previous), 'saved', 'unsaved' or 'matched'
+# (search: the saved search id). `when` defaults to the time the event is applied
+Event = namedtuple('Event', 'kind job_post_id status previous search when', defaults=(None, None, None, None))
+APPLIED = JobApplicationStatus.candidate_applied.value[0]
+
+
+def change_entry(job_post_id, title, company, status, at):
+    return {'job_post_id': str(job_post_id), 'title': title, 'company': company, 'status': status,
+            'at': at.isoformat()}
+
+
+def save_entry(job_post_id, title, company, expired_at):
+    return {'job_post_id': str(job_post_id), 'title': title, 'company': company, 'expired_at': expired_at.isoformat()}
+
+
+def match_entry(job_post_id, title, company, search, at):
+    return {'job_post_id': str(job_post_id), 'title': title, 'company': company, 'search': search,
+            'at': at.isoformat()}
+
+
+def expires(entry):
+    return parse_datetime(entry['expired_at'])
+
+
+def record(events):
+    """
+    Applies `events` ({applicant_id: [Event]}) to the applicants' summaries once the current transaction commits,
+    stamped with the time it did.
+    """
+    events = {applicant_id: applicant_events for applicant_id, applicant_events in events.items() if applicant_events}
+    if events:
+        transaction.on_commit(lambda: apply_events(events, timezone.now()))
+
+
+def apply_events(events, committed_at=None):
+    """
+    Applies `events` to the summaries of their applicants, except those rebuilt since `committed_at`: the rebuild
+    read the tables with the changes behind the events in them.
+    """
+    # dashboards lag until the next rebuild rather than failing the write that changed them
+    try:
+        job_post_ids = {event.job_post_id for applicant_events in events.values() for event in applicant_events}
+        jobs = {str(job_post_id): (title, company, expired_at) for job_post_id, title, company, expired_at in
+                JobPost.objects.filter(id__in=job_post_ids).values_list('id', 'title', 'company__name',
+                                                                        'expired_at')}
+        search_ids = {event.search for applicant_events in events.values() for event in applicant_events
+                      if event.search}
+        searches = dict(SavedSearch.objects.filter(id__in=search_ids).values_list('id', 'name')) if search_ids else {}
+    except DatabaseError:
+        logger.exception('could not update the candidate summaries')
+        return
+    for applicant_id, applicant_events in events.items():
+        try:
+            with transaction.atomic():
+                summary = CandidateSummary.objects.select_for_update().filter(applicant_id=applicant_id).first()
+                if summary is None or (committed_at and summary.rebuilt_at and committed_at <= summary.rebuilt_at):
+                    continue
+                for event in applicant_events:
+                    apply_event(summary, event, jobs, searches)
+                summary.save()
+        except DatabaseError:
+            logger.exception('could not update the candidate summary of %s', applicant_id)
+
+
+def apply_event(summary, event, jobs, searches):
+    limit = settings.CANDIDATE_SUMMARY_ENTRIES
+    when = event.when or timezone.now()
+    job_post_id = str(event.job_post_id)
+    job = jobs.get(job_post_id)
+    counts = summary.status_counts
+    if counts.get(event.previous, 0) > 1:
+        counts[event.previous] -= 1
+    else:
+        counts.pop(event.previous, None)
+    if event.kind in ('applied', 'status'):
+        counts[event.status] = counts.get(event.status, 0) + 1
+    if event.kind in ('applied', 'status', 'withdrawn'):
+        # one entry per application, its latest status, as when rebuilt
+        changes = [entry for entry in summary.recent_changes if entry['job_post_id'] != job_post_id]
+        if event.kind != 'withdrawn' and job:
+            changes.insert(0, change_entry(job_post_id, *job[:2], event.status, when))
+        summary.recent_changes = changes[:limit]
+    elif event.kind == 'saved':
+        summary.saved += 1
+        if job and job[2] > timezone.now():
+            saves = summary.expiring_saves + [save_entry(job_post_id, *job)]
+            summary.expiring_saves = sorted(saves, key=expires)[:limit]
+    elif event.kind == 'unsaved':
+        summary.saved = max(0, summary.saved - 1)
+        saves = [entry for entry in summary.expiring_saves if entry['job_post_id'] != job_post_id]
+        if len(saves) < len(summary.expiring_saves) == limit:
+            # the next soonest to expire was left out of the full list
+            saves = expiring_saves(summary.applicant_id)
+        summary.expiring_saves = saves
+    elif event.kind == 'matched':
+        summary.new_matches += 1
+        if job and event.search in searches:
+            summary.recent_matches = [match_entry(job_post_id, *job[:2], searches[event.search], when),
+                                      *summary.recent_matches][:limit]
+
+
+def expiring_saves(applicant_id):
+    rows = SavedJob.objects.filter(applicant_id=applicant_id, job_post__expired_at__gt=timezone.now()).order_by(
+        'job_post__expired_at').values_list('job_post_id', 'job_post__title', 'job_post__company__name',
+                                            'job_post__expired_at')
+    return [save_entry(*row) for row in rows[:settings.CANDIDATE_SUMMARY_ENTRIES]]
+
+
+def rebuild(applicant_id):
+    """
+    Recomputes the summary of the applicant from the source tables, creating it if missing. Matches created
+    since the applicant last saw their dashboard (all of them if never) count as new.
+    """
+    limit = settings.CANDIDATE_SUMMARY_ENTRIES
+    applications = JobApplication.objects.filter(applicant_id=applicant_id).order_by()
+    matches = SavedSearchMatch.objects.filter(saved_search__applicant_id=applicant_id).order_by()
+    with transaction.atomic():
+        summary, _ = CandidateSummary.objects.select_for_update().get_or_create(applicant_id=applicant_id)
+        # taken before reading: changes committed until now are counted below, their pending events skipped
+        summary.rebuilt_at = timezone.now()
+        summary.status_counts = dict(applications.values_list('status').annotate(n=Count('pk')))
+        summary.recent_changes = [change_entry(*row) for row in applications.order_by('-modified_at').values_list(
+            'job_post_id', 'job_post__title', 'job_post__company__name', 'status', 'modified_at')[:limit]]
+        summary.saved = SavedJob.objects.filter(applicant_id=applicant_id).count()
+        summary.expiring_saves = expiring_saves(applicant_id)
+        if summary.matches_seen_at:
+            summary.new_matches = matches.filter(created_at__gt=summary.matches_seen_at).count()
+        else:
+            summary.new_matches = matches.count()
+        summary.recent_matches = [match_entry(*row) for row in matches.order_by('-created_at').values_list(
+            'job_post_id', 'job_post__title', 'job_post__company__name', 'saved_search__name', 'created_at')[:limit]]
+        summary.save()
+    return summary
+
+
+def rebuild_on_commit(applicant_ids):
+    """
+    Rebuilds the existing summaries of `applicant_ids` once the current transaction commits, for changes made
+    without the receivers seeing them (queryset updates).
+    """
+    def rebuild_summaries():
+        try:
+            for applicant_id in CandidateSummary.objects.filter(applicant_id__in=applicant_ids).values_list(
+                    'applicant_id', flat=True):
+                rebuild(applicant_id)
+        except DatabaseError:
+            logger.exception('could not rebuild the candidate summaries')
+
+    if applicant_ids:
+        transaction.on_commit(rebuild_summaries)
+
+
+def dashboard(applicant_id):
+    """
+    What the dashboard of the applicant shows, from their summary (built on the first visit). Its new matches
+    are marked seen.
+    """
+    summary = CandidateSummary.objects.filter(applicant_id=applicant_id).first() or rebuild(applicant_id)
+    now = timezone.now()
+    saves = [entry for entry in summary.expiring_saves if expires(entry) > now]
+    if len(saves) < len(summary.expiring_saves):
+        if len(summary.expiring_saves) == settings.CANDIDATE_SUMMARY_ENTRIES:
+            saves = expiring_saves(applicant_id)
+        CandidateSummary.objects.filter(pk=summary.pk).update(expiring_saves=saves)
+    seen_at = summary.matches_seen_at
+    if summary.new_matches:
+        # less what was shown, so matches recorded meanwhile stay new
+        CandidateSummary.objects.filter(pk=summary.pk).update(
+            new_matches=Greatest(F('new_matches') - summary.new_matches, 0), matches_seen_at=now)
+    labels = dict(i.value for i in JobApplicationStatus)
+    soon = now + timedelta(days=settings.CANDIDATE_DASHBOARD_EXPIRING_DAYS)
+    return {
+        'status_counts': [(label, summary.status_counts.get(status, 0)) for status, label in labels.items()],
+        'applications': sum(summary.status_counts.values()),
+        'saved': summary.saved,
+        'new_matches': summary.new_matches,
+        'recent_changes': [{**entry, 'at': parse_datetime(entry['at']), 'status': labels.get(entry['status'])}
+                           for entry in summary.recent_changes],
+        'expiring_saves': [{**entry, 'expired_at': expires(entry)} for entry in saves if expires(entry) <= soon],
+        'recent_matches': [{**entry, 'at': parse_datetime(entry['at']),
+                            'is_new': seen_at is None or parse_datetime(entry['at']) > seen_at}
+                           for entry in summary.recent_matches],
+    }
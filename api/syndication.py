@@ -0,0 +1,308 @@
+"""
+Sitemaps and job feeds of every active job post, generated to gzipped files by the generate_syndication command.
+
+Active posts are split into shards of at most settings.SYNDICATION_SHARD_SIZE posts by creation time: a shard
+covers the posts created from its start up to the next shard's start, and the boundaries are kept in a manifest,
+so a post stays in its shard for life and a new shard only opens once the last one is full. Each shard is written
+as a sitemap, an RSS feed and a JSON feed, its posts ordered by modified_at and read in keyset batches of
+values(), so neither the database client nor the command ever holds more than a batch. A shard is rewritten only
+when its (count, latest modified_at) changed since the last run: an edit bumps modified_at, an expiry or a
+deletion lowers the count. The sitemap index (/sitemap.xml) lists the shards; /feeds/jobs.rss and
+/feeds/jobs.json carry the newest settings.JOB_FEED_SIZE posts and page back through the shard feeds.
+
+Every file is written to a temporary file of its own and renamed into place, and a run holds an exclusive lock on
+SYNDICATION_ROOT/.lock: a run starting while another is still writing gives up with SyndicationBusy.
+
+serve_syndication serves the files as they are, with Content-Encoding: gzip; a front web server can serve
+settings.SYNDICATION_ROOT directly instead (nginx: gzip_static on).
+"""
+import fcntl
+import gzip
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import format_datetime
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from api.media import file_etag
+from api.models import JobPost
+
+BATCH_SIZE = 1000
+MANIFEST = 'manifest.json'
+LOCK = '.lock'
+FIELDS = ('id', 'title', 'description', 'company__name', 'can_be_remote', 'pay_range_from', 'pay_range_to',
+          'payroll_method', 'created_at', 'modified_at')
+# served path (without .gz) -> content type
+CONTENT_TYPES = {'.xml': 'application/xml', '.rss': 'application/rss+xml', '.json': 'application/feed+json'}
+
+
+class SyndicationBusy(Exception):
+    pass
+
+
+def job_url(job_post_id):
+    return f'{settings.SITE_URL}/jobdetail/{job_post_id}/'
+
+
+def active_job_posts(now):
+    return JobPost.objects.filter(expired_at__gte=now)
+
+
+def shard_filter(shards, index):
+    """
+    The posts of shard `index`: created from its start (inclusive) to the next shard's start (exclusive), by
+    (created_at, id).
+    """
+    condition = Q()
+    for bound, inclusive in ((shards[index]['start'], True),
+                             (shards[index + 1]['start'] if index + 1 < len(shards) else None, False)):
+        if bound is None:
+            continue
+        created_at, pk = datetime.fromisoformat(bound[0]), bound[1]
+        after = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gte=pk)
+        condition &= after if inclusive else ~after
+    return condition
+
+
+def rows(queryset, ordering, fields=FIELDS):
+    """
+    values() of `queryset` in `ordering` (field names, ascending or all descending), a keyset batch at a time.
+    """
+    descending = ordering[0].startswith('-')
+    names = [name.lstrip('-') for name in ordering]
+    queryset = queryset.order_by(*ordering).values(*set(fields) | set(names))
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            # (a, b) > (x, y) as a or b: a > x, or a = x and b > y
+            condition = Q()
+            for i, name in enumerate(names):
+                step = Q(**{f'{name}__lt' if descending else f'{name}__gt': last[name]})
+                for previous in names[:i]:
+                    step &= Q(**{previous: last[previous]})
+                condition |= step
+            page = queryset.filter(condition)
+        batch = list(page[:BATCH_SIZE])
+        yield from batch
+        if len(batch) < BATCH_SIZE:
+            return
+        last = batch[-1]
+
+
+@contextmanager
+def replacing(path, mode='wb'):
+    """
+    A new temporary file next to `path`, renamed over it once written, so readers never see half a file; removed
+    instead if writing fails.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path), prefix=f'.{os.path.basename(path)}.',
+                                    suffix='.tmp', delete=False)
+    try:
+        with f:
+            yield f
+        # NamedTemporaryFile creates it 0600; served files are read by the web server too
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, path)
+    except BaseException:
+        os.remove(f.name)
+        raise
+
+
+def write_gzip(path, chunks):
+    """
+    Writes the text chunks gzipped to `path`.
+    """
+    with replacing(path) as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+        for chunk in chunks:
+            f.write(chunk.encode())
+
+
+@contextmanager
+def generation_lock(root):
+    with open(os.path.join(root, LOCK), 'w') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise SyndicationBusy(f'another run is writing to {root}')
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def sitemap(job_posts):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for job_post in job_posts:
+        yield (f'<url><loc>{escape(job_url(job_post["id"]))}</loc>'
+               f'<lastmod>{job_post["modified_at"].isoformat()}</lastmod></url>\n')
+    yield '</urlset>\n'
+
+
+def sitemap_index(shards):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for index, shard in enumerate(shards):
+        if shard['count']:
+            yield (f'<sitemap><loc>{escape(settings.SITE_URL)}/sitemaps/jobs-{index}.xml</loc>'
+                   f'<lastmod>{shard["modified"]}</lastmod></sitemap>\n')
+    yield '</sitemapindex>\n'
+
+
+def rss(job_posts, self_path, next_path):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">\n'
+    yield '<channel><title>Rozgaar Dhundo jobs</title>'
+    yield f'<link>{escape(settings.SITE_URL)}/joblist/</link><description>Open job posts</description>'
+    yield f'<atom:link rel="self" href={quoteattr(settings.SITE_URL + self_path)}/>'
+    if next_path:
+        # RFC 5005 paged feed
+        yield f'<atom:link rel="next" href={quoteattr(settings.SITE_URL + next_path)}/>'
+    yield '\n'
+    for job_post in job_posts:
+        url = escape(job_url(job_post['id']))
+        yield (f'<item><title>{escape(job_post["title"])} - {escape(job_post["company__name"])}</title>'
+               f'<link>{url}</link><guid isPermaLink="true">{url}</guid>'
+               f'<pubDate>{format_datetime(job_post["created_at"])}</pubDate>'
+               f'<description>{escape(job_post["description"])}</description></item>\n')
+    yield '</channel></rss>\n'
+
+
+def json_feed(job_posts, self_path, next_path):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    head = {'version': 'https://jsonfeed.org/version/1.1', 'title': 'Rozgaar Dhundo jobs',
+            'home_page_url': f'{settings.SITE_URL}/joblist/', 'feed_url': settings.SITE_URL + self_path}
+    if next_path:
+        head['next_url'] = settings.SITE_URL + next_path
+    yield encoder.encode(head)[:-1] + ',"items":['
+    for i, job_post in enumerate(job_posts):
+        item = {'id': str(job_post['id']), 'url': job_url(job_post['id']),
+                'title': f'{job_post["title"]} - {job_post["company__name"]}',
+                'content_text': job_post['description'], 'date_published': job_post['created_at'],
+                'date_modified': job_post['modified_at'],
+                '_job': {'company': job_post['company__name'], 'can_be_remote': job_post['can_be_remote'],
+                         'payroll_method': job_post['payroll_method'],
+                         'pay_range_from': job_post['pay_range_from'], 'pay_range_to': job_post['pay_range_to']}}
+        yield (',' if i else '') + encoder.encode(item)
+    yield ']}\n'
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'shards': [], 'feed': None}
+
+
+def split_full_shard(shards, active):
+    """
+    Opens a new shard after the last one when it holds more than SYNDICATION_SHARD_SIZE posts, starting at the
+    first post past the limit. Returns whether it did.
+    """
+    last = active.filter(shard_filter(shards, len(shards) - 1)).order_by('created_at', 'id').values_list(
+        'created_at', 'id')[settings.SYNDICATION_SHARD_SIZE:settings.SYNDICATION_SHARD_SIZE + 1]
+    for created_at, pk in last:
+        shards.append({'start': [created_at.isoformat(), str(pk)], 'count': None, 'modified': None,
+                       'has_next': None})
+        return True
+    return False
+
+
+def generate(root=None, force=False, now=None):
+    """
+    Brings the files in `root` (default settings.SYNDICATION_ROOT) up to date. Returns the number of files
+    written; raises SyndicationBusy if another run is at it.
+    """
+    root = root or settings.SYNDICATION_ROOT
+    os.makedirs(root, exist_ok=True)
+    with generation_lock(root):
+        return write_files(root, force, now or timezone.now())
+
+
+def write_files(root, force, now):
+    manifest = load_manifest(root)
+    shards = manifest['shards'] or [{'start': None, 'count': None, 'modified': None, 'has_next': None}]
+    active = active_job_posts(now)
+    while split_full_shard(shards, active):
+        pass
+    written = 0
+    for index, shard in enumerate(shards):
+        posts = active.filter(shard_filter(shards, index))
+        state = posts.aggregate(count=Count('id'), modified=Max('modified_at'))
+        state = {'count': state['count'], 'modified': state['modified'] and state['modified'].isoformat(),
+                 'has_next': index + 1 < len(shards)}
+        paths = [os.path.join(root, 'sitemaps', f'jobs-{index}.xml.gz'),
+                 os.path.join(root, 'feeds', f'jobs-{index}.rss.gz'),
+                 os.path.join(root, 'feeds', f'jobs-{index}.json.gz')]
+        if not force and all(shard[key] == value for key, value in state.items()) and all(
+                map(os.path.exists, paths)):
+            continue
+        shard.update(state)
+        next_path = f'/feeds/jobs-{index + 1}' if state['has_next'] else None
+        write_gzip(paths[0], sitemap(rows(posts, ['modified_at', 'id'], ('id', 'modified_at'))))
+        write_gzip(paths[1], rss(rows(posts, ['modified_at', 'id']), f'/feeds/jobs-{index}.rss',
+                                 next_path and next_path + '.rss'))
+        write_gzip(paths[2], json_feed(rows(posts, ['modified_at', 'id']), f'/feeds/jobs-{index}.json',
+                                       next_path and next_path + '.json'))
+        written += 3
+    latest = active.aggregate(count=Count('id'), modified=Max('modified_at'))
+    feed = {'count': latest['count'], 'modified': latest['modified'] and latest['modified'].isoformat()}
+    if written or force or feed != manifest['feed'] or not os.path.exists(os.path.join(root, 'sitemap.xml.gz')):
+        write_gzip(os.path.join(root, 'sitemap.xml.gz'), sitemap_index(shards))
+        write_gzip(os.path.join(root, 'feeds', 'jobs.rss.gz'), rss(
+            islice(rows(active, ['-modified_at', '-id']), settings.JOB_FEED_SIZE), '/feeds/jobs.rss',
+            '/feeds/jobs-0.rss'))
+        write_gzip(os.path.join(root, 'feeds', 'jobs.json.gz'), json_feed(
+            islice(rows(active, ['-modified_at', '-id']), settings.JOB_FEED_SIZE), '/feeds/jobs.json',
+            '/feeds/jobs-0.json'))
+        written += 3
+    with replacing(os.path.join(root, MANIFEST), 'w') as f:
+        json.dump({'shards': shards, 'feed': feed}, f)
+    return written
+
+
+def gunzipped(path):
+    with gzip.open(path, 'rb') as f:
+        yield from iter(lambda: f.read(64 * 1024), b'')
+
+
+@require_safe
+def serve_syndication(request, path):
+    """
+    /sitemap.xml, /sitemaps/jobs-<n>.xml and /feeds/jobs[-<n>].(rss|json), from the gzipped files.
+    """
+    content_type = CONTENT_TYPES.get(os.path.splitext(path)[1])
+    full_path = os.path.join(settings.SYNDICATION_ROOT, f'{path}.gz')
+    if content_type is None or not os.path.isfile(full_path):
+        raise Http404
+    stat = os.stat(full_path)
+    gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    etag = file_etag(full_path, stat.st_mtime_ns, stat.st_size)
+    if not gzipped:
+        # another representation of the same file, another etag
+        etag = f'{etag[:-1]}-identity"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        if gzipped:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = StreamingHttpResponse(gunzipped(full_path), content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(int(stat.st_mtime))
+    response['Cache-Control'] = f'public, max-age={settings.SYNDICATION_MAX_AGE}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
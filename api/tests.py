@@ -1,3 +1,545 @@
-from django.test import TestCase
+"""
+Run with: python manage.py test api --settings=online_job_portal.test_settings
+"""
+import fcntl
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPServerDisconnected
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import summaries, syndication, uploads
+from api.alerts import send_alert_notifications
+from api.autocomplete import INDEXES
+from api.choices import JobApplicationStatus
+from api.dedup import merge_duplicates
+from api.middleware import PRIMARY_STICKY_COOKIE
+from api.models import (CandidateSummary, City, Company, CustomUser, JobApplication, JobPost, SavedJob, SavedSearch,
+                        SavedSearchMatch, applicant_jobs_added)
+from api.passwords import HashingOverloaded
+from api.routers import PrimaryReplicaRouter, replica_reads_allowed
+
+
+def create_job_post(company, **fields):
+    fields = {'title': 'Python Developer', 'description': 'python django', 'payroll_method': 'A',
+              'pay_range_from': 30000, 'pay_range_to': 40000, 'expired_at': timezone.now() + timedelta(days=30),
+              **fields}
+    return JobPost.objects.create(company=company, **fields)
+
+
+def tables(queries):
+    return ' '.join(query['sql'] for query in queries)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # replica_0 mirrors default (online_job_portal.test_settings) over its own connection; transactions are
+    # committed, so what the primary wrote is visible to the replica as after replication
+    databases = {'default', 'replica_0'}
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        self.company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        self.job_post = create_job_post(self.company)
+        self.client.force_login(self.user)
+
+    def get_job_detail(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica_0']) as replica:
+            response = self.client.get(f'/jobdetail/{self.job_post.id}/')
+        self.assertEqual(response.status_code, 200)
+        return primary.captured_queries, replica.captured_queries
+
+    def test_read_only_view_reads_from_replica(self):
+        primary, replica = self.get_job_detail()
+        self.assertIn('"api_jobpost"', tables(replica))
+        self.assertNotIn('"api_jobpost"', tables(primary))
+
+    def test_sessions_and_users_read_from_primary(self):
+        primary, replica = self.get_job_detail()
+        self.assertIn('"django_session"', tables(primary))
+        self.assertIn('"api_customuser"', tables(primary))
+        self.assertNotIn('"django_session"', tables(replica))
+        self.assertNotIn('"api_customuser"', tables(replica))
+
+    def test_other_views_read_from_primary(self):
+        with CaptureQueriesContext(connections['replica_0']) as replica:
+            response = self.client.get('/applicationlist/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica.captured_queries, [])
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(JobPost), 'default')
+        token = replica_reads_allowed.set(True)
+        try:
+            self.assertEqual(self.router.db_for_write(SavedJob), 'default')
+            with CaptureQueriesContext(connections['default']) as primary, \
+                    CaptureQueriesContext(connections['replica_0']) as replica:
+                SavedJob.objects.create(applicant=self.user, job_post=self.job_post)
+        finally:
+            replica_reads_allowed.reset(token)
+        self.assertIn('INSERT INTO "api_savedjob"', tables(primary))
+        # the receivers of the save may read from it, never write
+        self.assertNotIn('INSERT', tables(replica))
+        self.assertNotIn('UPDATE', tables(replica))
+
+    def test_write_pins_reads_to_primary(self):
+        with CaptureQueriesContext(connections['replica_0']) as replica:
+            response = self.client.post('/savelist/', {'job_post': self.job_post.id, 'is_saving': 'true'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(replica.captured_queries, [])
+        self.assertTrue(SavedJob.objects.filter(applicant=self.user, job_post=self.job_post).exists())
+        self.assertIn(PRIMARY_STICKY_COOKIE, response.cookies)
+        primary, replica = self.get_job_detail()
+        self.assertIn('"api_jobpost"', tables(primary))
+        self.assertEqual(replica, [])
+
+    def test_expired_sticky_cookie_reads_from_replica(self):
+        self.client.cookies[PRIMARY_STICKY_COOKIE] = str(int(time.time()) - 1)
+        primary, replica = self.get_job_detail()
+        self.assertIn('"api_jobpost"', tables(replica))
+
+    def test_allow_relation(self):
+        self.assertTrue(self.router.allow_relation(self.job_post, self.company))
+
+    def test_allow_migrate_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'api', model_name='jobpost'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'api', model_name='jobpost'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'sessions'))
+
+
+class ConcurrentApplyTests(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        self.job_post = create_job_post(company)
+        self.signals = []
+        applicant_jobs_added.connect(self.added, dispatch_uid='concurrent_apply_test')
+        self.addCleanup(applicant_jobs_added.disconnect, dispatch_uid='concurrent_apply_test')
+
+    def added(self, sender, applicant_id, job_post_ids, **kwargs):
+        self.signals.append((sender, applicant_id, list(job_post_ids)))
+
+    def add_concurrently(self, model, **fields):
+        # every thread inserts at the same moment, on its own connection
+        barrier = threading.Barrier(self.threads)
+        results, errors = [], []
+
+        def add():
+            try:
+                barrier.wait()
+                results.append(model.objects.add_for(self.user.id, [self.job_post.id], **fields))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=add) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_applications_insert_one_row(self):
+        results = self.add_concurrently(JobApplication, status=JobApplicationStatus.candidate_applied.value[0])
+        self.assertEqual(JobApplication.objects.filter(applicant=self.user, job_post=self.job_post).count(), 1)
+        self.assertEqual(sorted(map(len, results)), [0] * (self.threads - 1) + [1])
+        self.assertEqual(self.signals, [(JobApplication, self.user.id, [self.job_post.id])])
+
+    def test_concurrent_saves_insert_one_row(self):
+        self.add_concurrently(SavedJob)
+        self.assertEqual(SavedJob.objects.filter(applicant=self.user, job_post=self.job_post).count(), 1)
+        self.assertEqual(self.signals, [(SavedJob, self.user.id, [self.job_post.id])])
+
+
+class AlertNotificationTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        saved_search = SavedSearch.objects.create(applicant=user, name='python', search='python')
+        self.match = SavedSearchMatch.objects.create(saved_search=saved_search, job_post=create_job_post(company))
+
+    def test_sent_matches_are_marked_notified(self):
+        self.assertEqual(send_alert_notifications(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.match.refresh_from_db()
+        self.assertIsNotNone(self.match.notified_at)
+
+    def test_failed_email_leaves_matches_pending(self):
+        with mock.patch('api.alerts.send_mail', side_effect=SMTPServerDisconnected('down')), \
+                self.assertLogs('api.alerts', 'ERROR'):
+            self.assertEqual(send_alert_notifications(), 0)
+        self.match.refresh_from_db()
+        self.assertIsNone(self.match.notified_at)
+        self.assertEqual(send_alert_notifications(), 1)
+
+
+class SavedSearchTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        self.client.force_login(self.user)
+
+    def test_invalid_ids_are_rejected(self):
+        self.assertEqual(self.client.post('/savedsearches/', {'delete': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.post('/savedsearches/', {'filters': 'search=python&skill=nope'}).status_code, 400)
+        self.assertFalse(SavedSearch.objects.exists())
+
+    def test_save_and_delete(self):
+        city = City.objects.create(name='Pune')
+        self.assertEqual(self.client.post('/savedsearches/', {'filters': f'search=python&city={city.id}'}).status_code,
+                         302)
+        saved_search = SavedSearch.objects.get(applicant=self.user)
+        self.assertEqual(list(saved_search.cities.all()), [city])
+        self.client.post('/savedsearches/', {'delete': str(saved_search.id)})
+        self.assertFalse(SavedSearch.objects.exists())
+
+
+class AdminSearchTests(TestCase):
+    def test_related_prefix_search_returns_every_match(self):
+        company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        job_post = create_job_post(company)
+        for i in range(3):
+            applicant = CustomUser.objects.create_user(email=f'ann{i}@example.com', password='password',
+                                                       first_name=f'Ann{i}')
+            JobApplication.objects.create(applicant=applicant, job_post=job_post)
+        JobApplication.objects.create(applicant=CustomUser.objects.create_user(
+            email='bob@example.com', password='password', first_name='Bob'), job_post=job_post)
+        staff = CustomUser.objects.create_superuser(email='staff@example.com', password='password')
+        self.client.force_login(staff)
+        response = self.client.get('/admin/api/jobapplication/', {'q': 'ann'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+
+class LoadCitiesTests(TestCase):
+    def load(self, rows):
+        path = os.path.join(tempfile.mkdtemp(), 'cities.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('name,latitude,longitude\n' + ''.join(f'{row}\n' for row in rows))
+        out = StringIO()
+        call_command('load_cities', path, format='csv', stdout=out)
+        return out.getvalue()
+
+    def test_counts_rows_actually_created(self):
+        self.assertIn('created 2 and updated 0', self.load(['Pune,18.52,73.85', 'Nagpur,21.14,79.08']))
+        self.assertIn('created 1 and updated 2', self.load(['Pune,18.52,73.85', 'Nagpur,21.14,79.08',
+                                                            'Nashik,19.99,73.78']))
+        # a row the insert skips as a conflict, as one created by another load meanwhile would be
+        real_bulk_create = City.objects.bulk_create
+
+        def conflicting_bulk_create(cities, **kwargs):
+            City.objects.create(name=cities[0].name)
+            return real_bulk_create(cities, **kwargs)
+
+        with mock.patch.object(City.objects, 'bulk_create', conflicting_bulk_create):
+            self.assertIn('created 0 and updated 0', self.load(['Mumbai,19.07,72.87']))
+
+
+class AutocompletePopularityTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        self.other = Company.objects.create(name='Globex', email='hr@globex.com', mobile_number='2',
+                                            logo='logo1.PNG')
+        self.job_post = create_job_post(self.company)
+        self.index = INDEXES['companies']
+        self.index.build()
+
+    def jobs(self, company):
+        return self.index.popularity.get(company.id, 0)
+
+    def test_edit_keeps_the_index(self):
+        self.job_post.title = 'Senior Python Developer'
+        self.job_post.save()
+        self.assertFalse(self.index.invalidated)
+        self.assertEqual(self.jobs(self.company), 1)
+
+    def test_company_change_moves_the_count(self):
+        self.job_post.company = self.other
+        self.job_post.save()
+        self.assertFalse(self.index.invalidated)
+        self.assertEqual((self.jobs(self.company), self.jobs(self.other)), (0, 1))
+
+    def test_expiring_and_reopening_adjust_the_count(self):
+        self.job_post.expired_at = timezone.now() - timedelta(days=1)
+        self.job_post.save()
+        self.assertEqual(self.jobs(self.company), 0)
+        self.job_post.expired_at = timezone.now() + timedelta(days=1)
+        self.job_post.save()
+        self.assertEqual(self.jobs(self.company), 1)
+
+
+# the job list reads from replicas, which cannot see the uncommitted rows of a TestCase
+@override_settings(DATABASE_REPLICAS=[])
+class JobListParamsTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        self.client.force_login(user)
+
+    def test_last_page(self):
+        company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        for i in range(7):
+            create_job_post(company, title=f'Job {i}')
+        response = self.client.get('/joblist/', {'page': 'last'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['job_posts']), 2)
+        self.assertEqual(self.client.get('/joblist/', {'page': 'first'}).status_code, 404)
+
+    def test_non_finite_numbers_are_ignored(self):
+        city = City.objects.create(name='Pune', latitude=18.52, longitude=73.86)
+        for value in ('NaN', 'Infinity', '-inf', 'sNaN'):
+            response = self.client.get('/joblist/', {'near_city': city.id, 'radius_km': value, 'min_salary': value})
+            self.assertEqual(response.status_code, 200, value)
+
+
+@override_settings(PASSWORD_HASHERS=['api.passwords.PooledPBKDF2PasswordHasher'], PASSWORD_HASHING_EXECUTOR='thread')
+class HashingOverloadedTests(TestCase):
+    def setUp(self):
+        overloaded = mock.patch('api.passwords.hashing_pool.run', side_effect=HashingOverloaded)
+        overloaded.start()
+        self.addCleanup(overloaded.stop)
+
+    def test_sign_in(self):
+        response = self.client.post('/signin/', {'email': 'candidate@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 503)
+
+    def test_sign_up(self):
+        response = self.client.post('/signup/', {'email': 'candidate@example.com', 'password': 'password',
+                                                 'first_name': 'A', 'last_name': 'B'})
+        self.assertEqual(response.status_code, 503)
+        self.assertContains(response, HashingOverloaded.message, status_code=503)
+        self.assertFalse(CustomUser.objects.filter(email='candidate@example.com').exists())
+
+    def test_admin_sign_in(self):
+        response = self.client.post('/admin/login/', {'username': 'staff@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(HashingOverloaded.retry_after))
+
+
+@override_settings(SYNDICATION_SHARD_SIZE=3, JOB_FEED_SIZE=2)
+class SyndicationTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def create_job_posts(self, total):
+        return [create_job_post(self.company, title=f'Job {i}') for i in range(total)]
+
+    def sitemap_ids(self, index):
+        with gzip.open(os.path.join(self.root, 'sitemaps', f'jobs-{index}.xml.gz'), 'rt') as f:
+            return [line.split('/jobdetail/')[1].split('/')[0] for line in f if '<loc>' in line]
+
+    def test_posts_are_split_into_shards_by_creation(self):
+        job_posts = self.create_job_posts(7)
+        syndication.generate(self.root)
+        manifest = syndication.load_manifest(self.root)
+        self.assertEqual([shard['count'] for shard in manifest['shards']], [3, 3, 1])
+        ids = [self.sitemap_ids(index) for index in range(3)]
+        self.assertEqual(sorted(sum(ids, [])), sorted(str(job_post.id) for job_post in job_posts))
+        by_creation = [str(job_post.id) for job_post in sorted(job_posts, key=lambda j: (j.created_at, j.id))]
+        self.assertEqual([sorted(shard) for shard in ids],
+                         [sorted(by_creation[:3]), sorted(by_creation[3:6]), sorted(by_creation[6:])])
+
+    def test_new_posts_open_a_shard_once_the_last_is_full(self):
+        self.create_job_posts(3)
+        syndication.generate(self.root)
+        self.assertEqual(len(syndication.load_manifest(self.root)['shards']), 1)
+        self.create_job_posts(1)
+        syndication.generate(self.root)
+        self.assertEqual([shard['count'] for shard in syndication.load_manifest(self.root)['shards']], [3, 1])
+
+    def test_unchanged_shards_are_skipped(self):
+        job_posts = self.create_job_posts(7)
+        self.assertEqual(syndication.generate(self.root), 3 * 3 + 3)
+        self.assertEqual(syndication.generate(self.root), 0)
+        # an edit rewrites its shard, then the index and the newest feeds
+        first = min(job_posts, key=lambda j: (j.created_at, j.id))
+        first.title = 'Senior Job'
+        first.save()
+        self.assertEqual(syndication.generate(self.root), 3 + 3)
+        # an expiry lowers its shard's count
+        first.expired_at = timezone.now() - timedelta(days=1)
+        first.save()
+        self.assertEqual(syndication.generate(self.root), 3 + 3)
+        self.assertNotIn(str(first.id), self.sitemap_ids(0))
+        self.assertEqual(syndication.generate(self.root, force=True), 3 * 3 + 3)
+
+    def test_keyset_pages_through_equal_modified_at(self):
+        job_posts = self.create_job_posts(7)
+        JobPost.objects.update(modified_at=timezone.now())
+        expected = sorted(str(job_post.id) for job_post in job_posts)
+        with mock.patch('api.syndication.BATCH_SIZE', 2):
+            ascending = [str(row['id']) for row in syndication.rows(JobPost.objects.all(), ['modified_at', 'id'])]
+            descending = [str(row['id']) for row in syndication.rows(JobPost.objects.all(), ['-modified_at', '-id'])]
+        self.assertEqual(ascending, expected)
+        self.assertEqual(descending, expected[::-1])
+
+    def test_overlapping_runs(self):
+        self.create_job_posts(1)
+        with syndication.generation_lock(self.root):
+            with self.assertRaises(syndication.SyndicationBusy):
+                syndication.generate(self.root)
+        syndication.generate(self.root)
+        self.assertEqual([name for name in os.listdir(self.root) if name.endswith('.tmp')], [])
+
+
+class CandidateSummaryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        self.company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        self.job_post = create_job_post(self.company)
+        summaries.rebuild(self.user.id)
+
+    def summary(self):
+        return CandidateSummary.objects.get(applicant=self.user)
+
+    def test_events_committed_before_a_rebuild_are_skipped(self):
+        with self.captureOnCommitCallbacks():
+            JobApplication.objects.create(applicant=self.user, job_post=self.job_post)
+        committed_at = timezone.now()
+        summaries.rebuild(self.user.id)
+        events = {self.user.id: [summaries.Event('applied', self.job_post.id, summaries.APPLIED)]}
+        summaries.apply_events(events, committed_at)
+        self.assertEqual(self.summary().status_counts, {summaries.APPLIED: 1})
+        summaries.apply_events(events, timezone.now())
+        self.assertEqual(self.summary().status_counts, {summaries.APPLIED: 2})
+
+    def test_merged_duplicates_are_rebuilt(self):
+        duplicate = create_job_post(self.company, title='Python Engineer')
+        JobPost.objects.filter(id=duplicate.id).update(duplicate_of=self.job_post)
+        JobApplication.objects.create(applicant=self.user, job_post=duplicate)
+        SavedJob.objects.create(applicant=self.user, job_post=duplicate)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(merge_duplicates(JobPost.objects.filter(id=duplicate.id)), 1)
+        summary = self.summary()
+        self.assertEqual(summary.status_counts, {summaries.APPLIED: 1})
+        self.assertEqual(summary.saved, 1)
+        self.assertEqual([entry['job_post_id'] for entry in summary.recent_changes], [str(self.job_post.id)])
+        self.assertEqual([entry['job_post_id'] for entry in summary.expiring_saves], [str(self.job_post.id)])
+
+
+class DuplicateMergeTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        company = Company.objects.create(name='Acme', email='hr@acme.com', mobile_number='1', logo='logo1.PNG')
+        # unrelated texts, so that only the flags set here link them
+        self.a, self.b, self.c = [create_job_post(company, title=title, description=description) for title, description
+                                  in [('Python Developer', 'django rest apis'), ('Accountant', 'ledgers and taxes'),
+                                      ('Chef', 'cooking for a busy kitchen')]]
+
+    def flag(self, job_post, original):
+        JobPost.objects.filter(id=job_post.id).update(duplicate_of=original)
+
+    def test_self_reference_is_rejected_and_not_merged(self):
+        self.a.duplicate_of = self.a
+        with self.assertRaises(ValidationError):
+            self.a.full_clean()
+        self.flag(self.a, self.a)
+        JobApplication.objects.create(applicant=self.user, job_post=self.a)
+        with self.assertLogs('api.dedup', 'WARNING'):
+            self.assertEqual(merge_duplicates(JobPost.objects.filter(id=self.a.id)), 0)
+        self.assertEqual(JobApplication.objects.filter(job_post=self.a).count(), 1)
+
+    def test_pointing_at_a_duplicate_is_rejected(self):
+        self.flag(self.b, self.a)
+        self.c.duplicate_of = self.b
+        with self.assertRaises(ValidationError):
+            self.c.full_clean()
+        self.c.duplicate_of = self.a
+        self.c.full_clean()
+
+    def test_chain_merges_into_its_root(self):
+        self.flag(self.b, self.a)
+        self.flag(self.c, self.b)
+        JobApplication.objects.create(applicant=self.user, job_post=self.c)
+        SavedJob.objects.create(applicant=self.user, job_post=self.b)
+        job_posts = JobPost.objects.filter(id__in=[self.b.id, self.c.id]).order_by('created_at')
+        self.assertEqual(merge_duplicates(job_posts), 2)
+        self.assertEqual(list(JobPost.objects.values_list('id', flat=True)), [self.a.id])
+        self.assertEqual(JobApplication.objects.get(applicant=self.user).job_post_id, self.a.id)
+        self.assertEqual(SavedJob.objects.get(applicant=self.user).job_post_id, self.a.id)
+
+
+@override_settings(DATABASE_REPLICAS=[], UPLOAD_MAX_SIZES={'resume': 64, 'profile_picture': 64}, UPLOAD_CHUNK_SIZE=16)
+class UploadTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(MEDIA_ROOT=self.root,
+                                              CHUNKED_UPLOAD_DIR=os.path.join(self.root, 'parts'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = CustomUser.objects.create_user(email='candidate@example.com', password='password')
+        self.client.force_login(self.user)
+
+    def post_resume(self, name, content):
+        return self.client.post('/profile/', {'resume': SimpleUploadedFile(name, content)})
+
+    def test_multipart_file_is_named_after_its_type(self):
+        self.assertEqual(self.post_resume('x.html', b'%PDF-<script>alert(1)</script>').status_code, 302)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.resume.name.endswith('.pdf'))
+        response = self.client.get(self.user.resume.url)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_multipart_file_over_its_cap_or_of_another_type_is_dropped(self):
+        self.assertEqual(self.post_resume('cv.pdf', b'%PDF-' + b'x' * 64).status_code, 400)
+        self.assertEqual(self.post_resume('cv.pdf', b'<html>not a pdf</html>').status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.resume)
+
+    def start(self, size):
+        return self.client.post('/api/v1/uploads/', {'kind': 'resume', 'size': size})
+
+    def send(self, upload_id, offset, chunk):
+        return self.client.patch(f'/api/v1/uploads/{upload_id}/', chunk, content_type='application/octet-stream',
+                                 HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_chunked_upload_answers_retries_once_complete(self):
+        content = b'%PDF-' + b'x' * 20
+        upload_id = self.start(len(content)).json()['id']
+        self.assertEqual(self.send(upload_id, 0, content[:16]).json()['offset'], 16)
+        self.assertEqual(self.send(upload_id, 0, content[:16]).status_code, 409)
+        done = self.send(upload_id, 16, content[16:]).json()
+        self.user.refresh_from_db()
+        self.assertEqual(done['url'], self.user.resume.url)
+        self.assertTrue(self.user.resume.name.endswith('.pdf'))
+        # the answer to the last chunk was lost: the retry and the offset probe both give the url
+        self.assertEqual(self.send(upload_id, 16, content[16:]).json()['url'], done['url'])
+        self.assertEqual(self.client.get(f'/api/v1/uploads/{upload_id}/').json()['url'], done['url'])
+        with self.user.resume.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_chunked_upload_size_cap_and_type(self):
+        self.assertEqual(self.start(65).status_code, 413)
+        upload_id = self.start(20).json()['id']
+        self.assertEqual(self.send(upload_id, 0, b'<html>not a pdf</html>'[:16]).status_code, 415)
+        self.assertEqual(self.client.get(f'/api/v1/uploads/{upload_id}/').status_code, 404)
+
+    def test_chunk_of_an_upload_being_received_is_refused(self):
+        upload_id = self.start(20).json()['id']
+        with open(uploads.part_path(uuid.UUID(upload_id)), 'rb') as part:
+            fcntl.flock(part, fcntl.LOCK_EX)
+            self.assertEqual(self.send(upload_id, 0, b'%PDF-').status_code, 409)
+        self.assertEqual(self.send(upload_id, 0, b'%PDF-').json()['offset'], 5)
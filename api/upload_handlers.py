@@ -1,6 +1,17 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler, SkipFile
 from django.utils import timezone
 from django.core.management.utils import get_random_string
 
+from strings import UPLOAD_TOO_LARGE, UPLOAD_WRONG_TYPE
+
+# leading bytes of the file types accepted for each upload, and the extension they are stored with
+UPLOAD_SIGNATURES = {
+    'resume': [(b'%PDF-', '.pdf')],
+    'profile_picture': [(b'\x89PNG\r\n\x1a\n', '.png'), (b'\xff\xd8\xff', '.jpg')],
+}
+SNIFF_BYTES = max(len(magic) for signatures in UPLOAD_SIGNATURES.values() for magic, _ in signatures)
+
 
 def get_extension(filename):
     return f".{filename.split('.')[-1]}"
@@ -23,3 +34,64 @@ def applicant_profile_picture(instance, filename):
 def company_logo(instance, filename):
     new_filename = f'logo/{instance.id.hex}/{get_random_name(filename)}'
     return new_filename
+
+
+def sniff_extension(kind, head):
+    """
+    Extension of the accepted type of `kind` whose signature `head` (the first bytes of the file) starts with,
+    None when it matches none of them.
+    """
+    for magic, extension in UPLOAD_SIGNATURES[kind]:
+        if head.startswith(magic):
+            return extension
+    return None
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams each file of a multipart request to a temporary file, so a large upload never sits in memory. A file
+    field listed in settings.UPLOAD_MAX_SIZES is dropped as soon as it grows past its cap or its first bytes are
+    not of an accepted type; request.upload_errors maps the fields dropped to the reason. The files kept get the
+    extension of their type.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        if request is not None:
+            request.upload_errors = {}
+
+    def new_file(self, field_name, *args, **kwargs):
+        self.head = b''
+        super().new_file(field_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.field_name in settings.UPLOAD_MAX_SIZES:
+            if start + len(raw_data) > settings.UPLOAD_MAX_SIZES[self.field_name]:
+                self.reject(UPLOAD_TOO_LARGE.format(max_mb=settings.UPLOAD_MAX_SIZES[self.field_name] // 2 ** 20))
+            if len(self.head) < SNIFF_BYTES:
+                self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+                if len(self.head) == SNIFF_BYTES and not sniff_extension(self.field_name, self.head):
+                    self.reject(UPLOAD_WRONG_TYPE)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.field_name not in settings.UPLOAD_MAX_SIZES:
+            return super().file_complete(file_size)
+        extension = sniff_extension(self.field_name, self.head)
+        if not extension:
+            # shorter than SNIFF_BYTES; not returning the file leaves it out of request.FILES
+            self.discard(UPLOAD_WRONG_TYPE)
+            return None
+        file = super().file_complete(file_size)
+        # named after its sniffed type, not the client's name, as media is served by extension (api.media)
+        file.name = f'{self.field_name}{extension}'
+        return file
+
+    def discard(self, message):
+        self.file.close()
+        if self.request is not None:
+            self.request.upload_errors[self.field_name] = message
+
+    def reject(self, message):
+        self.discard(message)
+        raise SkipFile
@@ -0,0 +1,167 @@
+"""
+Chunked, resumable uploads of resumes and profile pictures (api/v1/uploads/).
+
+An upload is declared first with its kind and size: a size over settings.UPLOAD_MAX_SIZES of the kind is refused
+before any byte is sent. Its bytes then arrive in chunks of at most settings.UPLOAD_CHUNK_SIZE, each sent with the
+offset it starts at, which must be the number of bytes received so far. A chunk is read from the request in
+pieces of PIECE_SIZE bytes that are appended to a part file on disk as they arrive, so a worker never holds more
+than a piece, and whatever arrived before a dropped connection is kept: the client asks for the offset and
+resumes from there. The first bytes are checked against the signatures of the kind (api.upload_handlers) as soon
+as they arrive. The chunk completing the file moves the part file to the upload_to path of the user's field,
+which is a rename as long as settings.CHUNKED_UPLOAD_DIR is on the filesystem of MEDIA_ROOT. The upload is kept,
+with the name of the stored file, until clear_stale removes it, so a client that lost the answer to its last
+chunk learns the url from the retry or the offset probe. A chunk is received under an exclusive flock of the part
+file, which holds across the workers of a host.
+"""
+import fcntl
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from api.models import ChunkedUpload
+from api.upload_handlers import SNIFF_BYTES, sniff_extension
+
+from strings import UPLOAD_TOO_LARGE, UPLOAD_WRONG_TYPE
+
+logger = logging.getLogger(__name__)
+
+PIECE_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class PartFile(File):
+    # FileSystemStorage moves a file that has a temporary_file_path instead of copying it
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload_id):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload_id.hex}.part')
+
+
+def offset(upload):
+    if upload.stored_name:
+        return upload.size
+    try:
+        return os.path.getsize(part_path(upload.id))
+    except OSError:
+        return 0
+
+
+def start(user, kind, size):
+    """
+    Declares an upload of `size` bytes into the `kind` field of `user`, replacing the user's unfinished upload of
+    the same kind if any.
+    """
+    max_size = settings.UPLOAD_MAX_SIZES[kind]
+    if size > max_size:
+        raise UploadError(UPLOAD_TOO_LARGE.format(max_mb=max_size // 2 ** 20), status=413)
+    if size <= 0:
+        raise UploadError('The file is empty.')
+    cancel(ChunkedUpload.objects.filter(user=user, kind=kind))
+    upload = ChunkedUpload.objects.create(user=user, kind=kind, size=size)
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(upload.id), 'xb').close()
+    return upload
+
+
+def append(upload, stream, start_offset, length):
+    """
+    Appends the `length` bytes of `stream` at `start_offset`. Returns the new offset, and stores the file once it
+    is complete. A chunk sent to a complete upload is ignored.
+    """
+    if upload.stored_name:
+        return upload.size
+    if length > settings.UPLOAD_CHUNK_SIZE:
+        raise UploadError(f'Chunks are at most {settings.UPLOAD_CHUNK_SIZE} bytes.', status=413)
+    if start_offset + length > upload.size:
+        raise UploadError('The chunk goes past the declared size.', status=413)
+    try:
+        with open(part_path(upload.id), 'r+b') as part:
+            try:
+                fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError('Another chunk of this upload is being received.', status=409)
+            if not os.path.samestat(os.fstat(part.fileno()), os.stat(part_path(upload.id))):
+                # stored or cancelled by the chunk that held the lock
+                raise FileNotFoundError
+            part.seek(0, os.SEEK_END)
+            if part.tell() != start_offset:
+                raise UploadError(f'Expected the chunk at offset {part.tell()}.', status=409)
+            part.seek(0)
+            head = part.read(SNIFF_BYTES)
+            part.seek(start_offset)
+            remaining = length
+            while remaining:
+                piece = stream.read(min(PIECE_SIZE, remaining))
+                if not piece:
+                    break
+                if len(head) < SNIFF_BYTES:
+                    head += piece[:SNIFF_BYTES - len(head)]
+                    if len(head) == SNIFF_BYTES and not sniff_extension(upload.kind, head):
+                        raise UploadError(UPLOAD_WRONG_TYPE, status=415)
+                part.write(piece)
+                remaining -= len(piece)
+            received = part.tell()
+            if received == upload.size:
+                # still under the lock, so the file is stored once
+                part.flush()
+                complete(upload, head)
+    except FileNotFoundError:
+        upload.refresh_from_db(fields=['stored_name'])
+        if upload.stored_name:
+            return upload.size
+        raise UploadError('Not found.', status=404)
+    except UploadError as e:
+        if e.status == 415:
+            cancel([upload])
+        raise
+    return received
+
+
+def complete(upload, head):
+    extension = sniff_extension(upload.kind, head)
+    if not extension:
+        # cancelled by append
+        raise UploadError(UPLOAD_WRONG_TYPE, status=415)
+    user = upload.user
+    with PartFile(open(part_path(upload.id), 'rb')) as part:
+        getattr(user, upload.kind).save(f'{upload.kind}{extension}', part, save=False)
+    user.save(update_fields=[upload.kind])
+    upload.stored_name = getattr(user, upload.kind).name
+    upload.save(update_fields=['stored_name'])
+
+
+def stored_url(upload):
+    return upload.user._meta.get_field(upload.kind).storage.url(upload.stored_name)
+
+
+def cancel(uploads):
+    for upload in uploads:
+        try:
+            os.remove(part_path(upload.id))
+        except FileNotFoundError:
+            pass
+        upload.delete()
+
+
+def clear_stale(max_age=None):
+    """
+    Removes the uploads started more than `max_age` (default settings.CHUNKED_UPLOAD_EXPIRY) seconds ago, with
+    their part if unfinished. Returns how many were removed.
+    """
+    max_age = settings.CHUNKED_UPLOAD_EXPIRY if max_age is None else max_age
+    stale = list(ChunkedUpload.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=max_age)))
+    cancel(stale)
+    logger.info('removed %d stale upload(s)', len(stale))
+    return len(stale)
@@ -1,18 +1,162 @@
+import hashlib
+import uuid
+from decimal import Decimal, InvalidOperation
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
 from django.db import transaction
 from django.db.models import Q, Exists, OuterRef, Subquery
+from django.http import Http404, HttpResponseBadRequest, QueryDict
 from django.shortcuts import redirect, render
 from django.utils import timezone
-from django.views.generic import ListView, TemplateView, DetailView
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.generic import ListView, TemplateView, DetailView, View
 from django.contrib.auth import authenticate, login, user_logged_out
 
+from api.caching import cached_result
 from api.choices import JobApplicationStatus
-from api.models import JobPost, CustomUser, Skill, City, Company, JobApplication, SavedJob
+from api.geo import cities_within
+from api.models import JobPost, CustomUser, Skill, City, Company, JobApplication, SavedJob, SavedSearch
+from api.passwords import HashingOverloaded, throttle_sign_in, throttle_sign_up
+from api.summaries import dashboard
 
 from strings import *
 
 
+def job_detail_etag(request, pk):
+    # the detail page shows the post, its company and whether this user applied/saved it, so all of them go
+    # into the validator; computing it is one indexed lookup, far cheaper than rendering the page
+    try:
+        row = JobPost.objects.filter(id=pk).annotate(
+            is_applied=Exists(JobApplication.objects.filter(job_post_id=OuterRef('id'), applicant_id=request.user.id)),
+            is_saved=Exists(SavedJob.objects.filter(job_post_id=OuterRef('id'), applicant_id=request.user.id)),
+        ).values_list('modified_at', 'company__modified_at', 'is_applied', 'is_saved').first()
+    except ValidationError:
+        return None
+    if row is None:
+        return None
+    key = ':'.join(str(value) for value in (request.user.id,) + row)
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def parse_ids(values):
+    """
+    The ids (job posts, skills, ...) posted in `values`; ValueError if one is not a UUID.
+    """
+    return {uuid.UUID(value) for value in values}
+
+
+def active_job_post_ids(job_post_ids):
+    # only active posts can be applied to/saved; add_for then skips the pairs that already exist
+    return list(JobPost.objects.filter(id__in=job_post_ids, expired_at__gte=timezone.now()).values_list('id',
+                                                                                                   flat=True))
+
+
+def filter_job_posts(qs, params):
+    """
+    Applies the /joblist/ search filters in `params` (a QueryDict) to a JobPost queryset.
+    """
+    skills = params.getlist("skill")
+    cities = params.getlist("city")
+    companies = params.getlist("company")
+    from_date = params.get('from_date')
+    to_date = params.get('to_date')
+    search = params.get('search')
+    min_salary = parse_decimal(params.get('min_salary'))
+    max_salary = parse_decimal(params.get('max_salary'))
+    near_cities = params.getlist('near_city')
+    radius_km = parse_decimal(params.get('radius_km'))
+
+    if from_date:
+        qs = qs.filter(created_at__date__gte=from_date)
+    if to_date:
+        qs = qs.filter(created_at__date__lte=to_date)
+    # salary filters compare against the annualized pay so hourly/monthly/yearly posts rank together
+    if min_salary is not None:
+        qs = qs.filter(annual_pay_to__gte=min_salary)
+    if max_salary is not None:
+        qs = qs.filter(annual_pay_from__lte=max_salary)
+    if params.get("is_remote", None):
+        is_remote = params.get("is_remote").lower() in ("yes", "true", "t", "1")
+        qs = qs.filter(can_be_remote=is_remote)
+    if skills:
+        qs = qs.filter(skills__in=skills)
+    if cities:
+        qs = qs.filter(cities__in=cities)
+    if near_cities and radius_km is not None:
+        centers = City.objects.filter(id__in=near_cities, latitude__isnull=False).values_list('latitude', 'longitude')
+        qs = qs.filter(cities__in=cities_within(centers, float(radius_km)))
+    if companies:
+        qs = qs.filter(company_id__in=companies)
+    if search:
+        qs = qs.filter(Q(title__icontains=search) |
+                       Q(company__name__icontains=search) |
+                       Q(description__icontains=search))
+    return qs
+
+
+JOB_LIST_CACHE_PARAMS = ('skill', 'city', 'company', 'near_city', 'radius_km', 'from_date', 'to_date', 'is_remote',
+                         'search', 'min_salary', 'max_salary', 'sort')
+
+
+def job_list_signature(params, page_number, page_size):
+    """
+    Normalized form of the job list filters, so the same search in any parameter order shares a cache entry.
+    """
+    parts = [f'{name}={",".join(sorted(value.strip().lower() for value in params.getlist(name)))}'
+             for name in JOB_LIST_CACHE_PARAMS]
+    return '&'.join(parts + [f'page={page_number}', f'size={page_size}'])
+
+
+def job_list_cache_tags(params):
+    """
+    A job can only show up in a filtered list if it has one of the filtered companies (or skills, or cities),
+    so the result only needs to depend on those tags; anything else depends on every job post change.
+    """
+    for name in ('company', 'skill', 'city'):
+        values = params.getlist(name)
+        if values:
+            return sorted({f'jobs:{name}:{value}' for value in values})
+    return ['jobs:all']
+
+
+class CachedJobList:
+    """
+    Stands in for the job list queryset in the paginator: the count and the ids of the requested page come
+    from the result cache, and only that page's rows are loaded, by primary key.
+    """
+
+    def __init__(self, count, ids):
+        self.total = count
+        self.ids = ids
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, item):
+        job_posts = JobPost.objects.filter(id__in=self.ids).defer('description').select_related('company')
+        job_posts = {job_post.id: job_post for job_post in job_posts}
+        return [job_posts[job_post_id] for job_post_id in self.ids if job_post_id in job_posts]
+
+
+def parse_decimal(value):
+    if not value:
+        return None
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        return None
+    # NaN and Infinity parse, but no filter (or the radius search) can use them
+    return value if value.is_finite() else None
+
+
 class HomepageView(TemplateView):
     template_name = 'api/home_page.html'
 
@@ -31,12 +175,10 @@ class CandidateProfileView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context_data = super(CandidateProfileView, self).get_context_data(**kwargs)
-        skills = Skill.objects.all().annotate(is_added=Exists(self.request.user.skills.filter(id=OuterRef('id'))))
-        cities = City.objects.all().annotate(
-            is_added=Exists(self.request.user.preferred_locations.filter(id=OuterRef('id'))))
+        # only the user's own skills/locations are rendered, the typeahead (api/v1/autocomplete/) finds the others
         extra_context = {
-            'skills': skills.values('id', 'name', 'is_added'),
-            'cities': cities.values('id', 'name', 'is_added'),
+            'skills': self.request.user.skills.all().values('id', 'name'),
+            'cities': self.request.user.preferred_locations.all().values('id', 'name'),
         }
         context_data.update(extra_context)
         user = self.request.user
@@ -61,9 +203,27 @@ class CandidateProfileView(LoginRequiredMixin, TemplateView):
         preferred_locations = City.objects.filter(id__in=request.POST.getlist('location'))
         user.skills.set(skills)
         user.preferred_locations.set(preferred_locations)
+        # files dropped by api.upload_handlers.LimitedUploadHandler, the rest of the profile is saved
+        upload_errors = getattr(request, 'upload_errors', None)
+        if upload_errors:
+            context_data = self.get_context_data()
+            context_data.update({'message': ' '.join(upload_errors.values())})
+            return render(request, self.template_name, context=context_data, status=400)
         return redirect('profile')
 
 
+class CandidateDashboardView(LoginRequiredMixin, TemplateView):
+    template_name = 'api/dashboard.html'
+    login_url = '/signin/'
+
+    def get_context_data(self, **kwargs):
+        context_data = super(CandidateDashboardView, self).get_context_data(**kwargs)
+        # one lookup of the user's activity summary (api.summaries), not queries over their applications
+        context_data.update(dashboard(self.request.user.id))
+        context_data.update({'user': self.request.user})
+        return context_data
+
+
 class CandidateSignUpView(TemplateView):
     template_name = 'api/sign_up.html'
 
@@ -77,6 +237,10 @@ class CandidateSignUpView(TemplateView):
 
     @transaction.atomic
     def post(self, request):
+        retry_after = throttle_sign_up(request)
+        if retry_after:
+            return render(request, self.template_name,
+                          context={'message': LOGIN_THROTTLED.format(retry_after=retry_after)}, status=429)
         try:
             user = CustomUser.objects.create_user(
                 email=request.POST['email'],
@@ -92,6 +256,8 @@ class CandidateSignUpView(TemplateView):
                 CustomUser.objects.filter(id=user.id).update(last_login=current_date_time,
                                                              date_joined=current_date_time)
                 return redirect('profile')
+        except HashingOverloaded as e:
+            return render(request, self.template_name, context={'message': e.message}, status=503)
         except Exception as e:
             message = getattr(e, 'message', GENERIC_ERROR)
             return render(request, self.template_name, context={'message': message})
@@ -109,10 +275,17 @@ class CandidateSignInView(TemplateView):
         return context_data
 
     def post(self, request):
-        user = authenticate(
-            email=request.POST['email'],
-            password=request.POST['password'],
-        )
+        retry_after = throttle_sign_in(request, request.POST['email'])
+        if retry_after:
+            return render(request, self.template_name,
+                          context={'message': LOGIN_THROTTLED.format(retry_after=retry_after)}, status=429)
+        try:
+            user = authenticate(
+                email=request.POST['email'],
+                password=request.POST['password'],
+            )
+        except HashingOverloaded as e:
+            return render(request, self.template_name, context={'message': e.message}, status=503)
         if user is not None:
             login(request, user)
             CustomUser.objects.filter(id=user.id).update(last_login=timezone.now())
@@ -138,62 +311,88 @@ class CandidateSignOutView(LoginRequiredMixin, TemplateView):
 
 class JobPostListView(LoginRequiredMixin, ListView):
     login_url = '/signin/'
+    use_read_replica = True
     template_name = 'api/job_list.html'
     model = JobPost
     paginate_by = 5
     context_object_name = 'job_posts'
     queryset = JobPost.objects.all()
-    extra_context = {
-        'skills': Skill.objects.all().values('id', 'name'),
-        'cities': City.objects.all().values('id', 'name'),
-        'companies': Company.objects.all().values('id', 'name'),
-    }
 
     def get_queryset(self):
         qs = super(JobPostListView, self).get_queryset()
         qs = qs.filter(expired_at__gte=timezone.now()).defer('description').select_related('company')
-        skills = self.request.GET.getlist("skill")
-        cities = self.request.GET.getlist("city")
-        companies = self.request.GET.getlist("company")
-        from_date = self.request.GET.get('from_date')
-        to_date = self.request.GET.get('to_date')
-        search = self.request.GET.get('search')
-
-        if from_date:
-            qs = qs.filter(created_at__date__gte=from_date)
-        if to_date:
-            qs = qs.filter(created_at__date__lte=to_date)
-        if self.request.GET.get("is_remote", None):
-            is_remote = self.request.GET.get("is_remote").lower() in ("yes", "true", "t", "1")
-            qs = qs.filter(can_be_remote=is_remote)
-        if skills:
-            qs = qs.filter(skills__in=skills)
-        if cities:
-            qs = qs.filter(cities__in=cities)
-        if companies:
-            qs = qs.filter(company_id__in=companies)
-        if search:
-            qs = qs.filter(Q(title__icontains=search) |
-                           Q(company__name__icontains=search) |
-                           Q(description__icontains=search))
+        params = self.request.GET
+        if params.get('near_preferred'):
+            # radius search around every preferred location of the candidate
+            params = params.copy()
+            params.setlist('near_city', [str(city_id) for city_id in
+                                         self.request.user.preferred_locations.values_list('id', flat=True)])
+        qs = filter_job_posts(qs, params)
+        self.filter_params = params
+        if self.request.GET.get('sort') == 'highest_paying':
+            qs = qs.order_by('-annual_pay_to', '-created_at')
         return qs.distinct()
 
+    def cached_page(self, queryset, page_size, page_number):
+        def compute():
+            page = self.get_paginator(queryset, page_size).page(page_number)
+            expiries = [job_post.expired_at for job_post in page.object_list]
+            return {'count': page.paginator.count, 'ids': [job_post.id for job_post in page.object_list],
+                    'expires_at': min(expiries) if expiries else None}
+
+        return cached_result(job_list_signature(self.filter_params, page_number, page_size),
+                             job_list_cache_tags(self.filter_params), compute,
+                             settings.JOB_LIST_CACHE_FRESH, settings.JOB_LIST_CACHE_STALE,
+                             # a job on the page has expired since: recompute rather than show it
+                             is_valid=lambda value: value['expires_at'] is None
+                             or value['expires_at'] >= timezone.now())
+
+    def paginate_queryset(self, queryset, page_size):
+        page_number = self.request.GET.get(self.page_kwarg) or 1
+        try:
+            if page_number == 'last':
+                # as MultipleObjectMixin does, from the count cached with the first page
+                first = self.cached_page(queryset, page_size, 1)
+                page_number = self.get_paginator(CachedJobList(first['count'], []), page_size).num_pages
+            result = self.cached_page(queryset, page_size, page_number)
+            paginator = self.get_paginator(CachedJobList(result['count'], result['ids']), page_size)
+            page = paginator.page(page_number)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context_data = super(JobPostListView, self).get_context_data(**kwargs)
         user = self.request.user
         if not self.request.user.is_authenticated:
             user = None
-        context_data.update({'user': user})
+        # only the selected options are rendered, the typeahead (api/v1/autocomplete/) finds the others
+        params = self.request.GET
+        context_data.update({'user': user,
+                             'skills': Skill.objects.filter(id__in=params.getlist('skill')).values('id', 'name'),
+                             'cities': City.objects.filter(id__in=params.getlist('city')).values('id', 'name'),
+                             'companies': Company.objects.filter(id__in=params.getlist('company')).values('id', 'name'),
+                             'near_cities': City.objects.filter(id__in=params.getlist('near_city')).values('id',
+                                                                                                            'name'),
+                             'current_filters': self.request.GET.urlencode(),
+                             'fragment_cache_timeout': settings.TEMPLATE_FRAGMENT_CACHE_TIMEOUT,
+                             })
         return context_data
 
 
 class JobPostDetailView(LoginRequiredMixin, DetailView):
     login_url = '/signin/'
+    use_read_replica = True
     template_name = 'api/job_detail.html'
     model = JobPost
     context_object_name = 'job_post'
     queryset = JobPost.objects.all().select_related('company')
 
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=job_detail_etag))
+    def get(self, request, *args, **kwargs):
+        return super(JobPostDetailView, self).get(request, *args, **kwargs)
+
     def get_queryset(self):
         qs = super(JobPostDetailView, self).get_queryset()
         qs = qs.annotate(
@@ -279,13 +478,15 @@ class JobApplicationListView(LoginRequiredMixin, ListView):
     @transaction.atomic
     def post(self, request):
         applicant = request.user
-        job_post = request.POST['job_post']
+        try:
+            job_post_ids = parse_ids([request.POST.get('job_post', '')])
+        except ValueError:
+            return HttpResponseBadRequest(INVALID_JOB_POST)
         if request.POST.get('is_applying', 'False').lower() in ("yes", "true", "t", "1"):
-            job_post = JobPost.objects.get(id=request.POST['job_post'])
-            JobApplication.objects.get_or_create(applicant=applicant, job_post=job_post,
-                                                 status=JobApplicationStatus.candidate_applied.value[0])
+            JobApplication.objects.add_for(applicant.id, active_job_post_ids(job_post_ids),
+                                           status=JobApplicationStatus.candidate_applied.value[0])
         else:
-            JobApplication.objects.filter(applicant_id=applicant.id, job_post_id=job_post).delete()
+            JobApplication.objects.filter(applicant_id=applicant.id, job_post_id__in=job_post_ids).delete()
         return redirect('applicationlist')
 
 
@@ -349,10 +550,92 @@ class JobSaveListView(LoginRequiredMixin, ListView):
     @transaction.atomic
     def post(self, request):
         applicant = request.user
-        job_post = request.POST['job_post']
+        try:
+            job_post_ids = parse_ids([request.POST.get('job_post', '')])
+        except ValueError:
+            return HttpResponseBadRequest(INVALID_JOB_POST)
         if request.POST.get('is_saving', 'False').lower() in ("yes", "true", "t", "1"):
-            job_post = JobPost.objects.get(id=request.POST['job_post'])
-            SavedJob.objects.get_or_create(applicant=applicant, job_post=job_post)
+            SavedJob.objects.add_for(applicant.id, active_job_post_ids(job_post_ids))
         else:
-            SavedJob.objects.filter(applicant_id=applicant.id, job_post_id=job_post).delete()
+            SavedJob.objects.filter(applicant_id=applicant.id, job_post_id__in=job_post_ids).delete()
         return redirect('savelist')
+
+
+class JobBulkActionView(LoginRequiredMixin, View):
+    """
+    Applies to, un-applies from, saves or un-saves every job in the posted `job_post` list in one request.
+    """
+    login_url = '/signin/'
+    http_method_names = ['post']
+    actions = {
+        'apply': (JobApplication, 'applicationlist'),
+        'unapply': (JobApplication, 'applicationlist'),
+        'save': (SavedJob, 'savelist'),
+        'unsave': (SavedJob, 'savelist'),
+    }
+
+    @transaction.atomic
+    def post(self, request):
+        action = request.POST.get('action')
+        if action not in self.actions:
+            return HttpResponseBadRequest(INVALID_BULK_ACTION)
+        model, redirect_to = self.actions[action]
+        try:
+            job_post_ids = parse_ids(request.POST.getlist('job_post')[:settings.BULK_ACTION_MAX_JOBS])
+        except ValueError:
+            return HttpResponseBadRequest(INVALID_JOB_POST)
+
+        if action in ('apply', 'save'):
+            fields = {'status': JobApplicationStatus.candidate_applied.value[0]} if model is JobApplication else {}
+            model.objects.add_for(request.user.id, active_job_post_ids(job_post_ids), **fields)
+        else:
+            model.objects.filter(applicant_id=request.user.id, job_post_id__in=job_post_ids).delete()
+        return redirect(redirect_to)
+
+
+class SavedSearchListView(LoginRequiredMixin, ListView):
+    login_url = '/signin/'
+    template_name = 'api/saved_search_list.html'
+    model = SavedSearch
+    context_object_name = 'saved_searches'
+
+    def get_queryset(self):
+        qs = super(SavedSearchListView, self).get_queryset()
+        return qs.filter(applicant_id=self.request.user.id).prefetch_related('skills', 'cities', 'companies')
+
+    def get_context_data(self, **kwargs):
+        context_data = super(SavedSearchListView, self).get_context_data(**kwargs)
+        user = self.request.user
+        if not self.request.user.is_authenticated:
+            user = None
+        context_data.update({'user': user})
+        return context_data
+
+    @transaction.atomic
+    def post(self, request):
+        if request.POST.get('delete'):
+            try:
+                saved_search_ids = parse_ids([request.POST['delete']])
+            except ValueError:
+                return HttpResponseBadRequest(INVALID_SAVED_SEARCH)
+            SavedSearch.objects.filter(applicant_id=request.user.id, id__in=saved_search_ids).delete()
+            return redirect('savedsearches')
+        # the job list posts its current GET filters as one urlencoded string
+        filters = QueryDict(request.POST.get('filters', ''))
+        try:
+            skill_ids, city_ids, company_ids = [parse_ids(filters.getlist(name))
+                                                for name in ('skill', 'city', 'company')]
+        except ValueError:
+            return HttpResponseBadRequest(INVALID_SEARCH_FILTERS)
+        is_remote = filters.get('is_remote')
+        saved_search = SavedSearch.objects.create(
+            applicant=request.user,
+            name=request.POST.get('name') or filters.get('search') or SAVED_SEARCH_DEFAULT_NAME,
+            can_be_remote=is_remote.lower() in ("yes", "true", "t", "1") if is_remote else None,
+            search=filters.get('search', '')[:250],
+            min_salary=parse_decimal(filters.get('min_salary')),
+        )
+        saved_search.skills.set(Skill.objects.filter(id__in=skill_ids))
+        saved_search.cities.set(City.objects.filter(id__in=city_ids))
+        saved_search.companies.set(Company.objects.filter(id__in=company_ids))
+        return redirect('savedsearches')
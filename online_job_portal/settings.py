@@ -28,7 +28,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'True').lower() in ('yes', 'true', 't', '1')
 
 ALLOWED_HOSTS = ['*']
 
@@ -50,19 +50,26 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
+    'api.middleware.HashingOverloadedMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'online_job_portal.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -70,6 +77,8 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # templates are parsed once per process and kept compiled outside of DEBUG
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
@@ -87,10 +96,117 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
-
+        # keep connections open across requests instead of reconnecting on every request
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# comma separated hosts of read replicas of the default database, see api.routers.PrimaryReplicaRouter
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(DATABASES['default'], HOST=replica_host.strip(), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+# ping persistent connections at the start of each request and drop the ones the server has closed
+DATABASE_HEALTH_CHECKS = True
+# seconds a user's reads stay on the primary after they wrote something
+REPLICA_STICKY_SECONDS = 10
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'online-job-portal',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # sign in/sign up attempt counters (api/passwords.py): kept in each process, so checking them costs no
+    # network round trip even when 'default' moves to a shared cache
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'online-job-portal-throttle',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# seconds a rendered template fragment (job rows) is kept, see api/templates/api/job_list.html
+TEMPLATE_FRAGMENT_CACHE_TIMEOUT = 60 * 10
+
+# job list result cache (api.caching.cached_result): seconds a page is fresh, then served stale while it refreshes
+JOB_LIST_CACHE_FRESH = 30
+JOB_LIST_CACHE_STALE = 120
+# how long a cache lock protecting a recompute lives, and how long other processes wait on it
+RESULT_CACHE_LOCK_TIMEOUT = 30
+RESULT_CACHE_LOCK_WAIT = 2
+
+# admin changelists of large tables (api/admin_scaling.py): counts stop at ADMIN_COUNT_LIMIT rows and unfiltered
+# tables larger than that show the estimate from the table statistics
+ADMIN_COUNT_LIMIT = 100000
+
+# rows per UPDATE of the bulk application status transitions (api/applications.py)
+APPLICATION_TRANSITION_BATCH_SIZE = 1000
+
+# days shown by the chart of the hiring stats admin (api/rollups.py)
+HIRING_STATS_CHART_DAYS = 30
+
+# candidate dashboard (api/summaries.py): entries kept in each list of a user's activity summary, and how many days
+# ahead a saved job is listed as about to expire
+CANDIDATE_SUMMARY_ENTRIES = 10
+CANDIDATE_DASHBOARD_EXPIRING_DAYS = 7
+
+# near-duplicate job posts (api/dedup.py): MinHash signatures of JOB_DEDUP_BANDS * JOB_DEDUP_ROWS values, split into
+# JOB_DEDUP_BANDS buckets; posts sharing a bucket whose signatures agree on JOB_DEDUP_THRESHOLD of their values are
+# duplicates. 16 bands of 4 make posts about 50% similar candidates, so few 80% similar ones are missed
+JOB_DEDUP_BANDS = 16
+JOB_DEDUP_ROWS = 4
+JOB_DEDUP_THRESHOLD = 0.8
+
+# typeahead (api/autocomplete.py): most suggestions returned, and how often the in-memory indexes are rebuilt
+AUTOCOMPLETE_MAX_RESULTS = 20
+AUTOCOMPLETE_REBUILD_SECONDS = 60 * 10
+
+# JSON API (api/api_views.py): page sizes and requests allowed per client per window (seconds)
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_RATE_LIMIT = 120
+API_RATE_LIMIT_WINDOW = 60
+
+# most jobs a candidate can apply to/save in one bulk request (api.views.JobBulkActionView)
+BULK_ACTION_MAX_JOBS = 100
+
+# Email, used for saved search alerts (api/alerts.py)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@rozgaardhundo.com')
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
+
+# PBKDF2 runs on a pool of PASSWORD_HASHING_WORKERS 'thread's or 'process'es ('' hashes inline in the request
+# thread), so a wave of sign ins cannot take every core from page views; with PASSWORD_HASHING_MAX_QUEUE hashes
+# already waiting for the pool, further sign ins are refused (api/passwords.py)
+PASSWORD_HASHERS = [
+    'api.passwords.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHING_EXECUTOR = os.getenv('PASSWORD_HASHING_EXECUTOR', 'thread')
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_MAX_QUEUE = 16
+
+# attempts accepted per LOGIN_RATE_LIMIT_WINDOW seconds before any password is hashed: sign ins per IP and per
+# email, sign ups per IP
+LOGIN_RATE_LIMIT_WINDOW = 60 * 5
+LOGIN_RATE_LIMIT_IP = 30
+LOGIN_RATE_LIMIT_EMAIL = 5
+SIGNUP_RATE_LIMIT_IP = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -130,9 +246,40 @@ STATICFILES_DIRS = [
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # media directory in the root directory
 MEDIA_URL = '/media/'
 
-# FILE_UPLOAD_HANDLERS = [
-#     "django.core.files.uploadhandler.TemporaryFileUploadHandler"
-# ]
+# media files are served by api.media.serve_media with etags and cache headers. Set MEDIA_SENDFILE_HEADER to
+# 'X-Accel-Redirect' (nginx, internal location at MEDIA_SENDFILE_PREFIX) or 'X-Sendfile' (apache/lighttpd)
+# to let the web server send the bytes; left empty, django streams the file with FileResponse.
+MEDIA_SENDFILE_HEADER = os.getenv('MEDIA_SENDFILE_HEADER', '')
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+# files under MEDIA_PRIVATE_PREFIXES/<user id hex>/ (resumes, profile pictures) are only served to that user and
+# to staff, never cached by shared caches; files under MEDIA_IMMUTABLE_PREFIXES are public and cached for a year
+MEDIA_PRIVATE_PREFIXES = ['resume/', 'applicant/']
+MEDIA_IMMUTABLE_PREFIXES = ['logo/']
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
+# sitemaps and job feeds (api/syndication.py), written by the generate_syndication command: posts per sitemap/feed
+# shard, posts in the newest jobs feed, and how long clients may cache the files
+SYNDICATION_ROOT = os.path.join(BASE_DIR, 'syndication')
+SYNDICATION_SHARD_SIZE = 10000
+JOB_FEED_SIZE = 100
+SYNDICATION_MAX_AGE = 60 * 60
+
+# multipart uploads are streamed to temporary files; resume and profile picture fields over their
+# UPLOAD_MAX_SIZES cap (bytes) or not of an accepted type are dropped while streaming (api/upload_handlers.py)
+FILE_UPLOAD_HANDLERS = [
+    'api.upload_handlers.LimitedUploadHandler',
+]
+UPLOAD_MAX_SIZES = {
+    'resume': 5 * 2 ** 20,
+    'profile_picture': 2 * 2 ** 20,
+}
+
+# chunked, resumable uploads (api/uploads.py): largest chunk a request may carry, where the parts are kept until
+# complete (on the filesystem of MEDIA_ROOT, so the finished file is renamed into place), and seconds after its
+# start an upload is removed by clear_stale_uploads (its part if unfinished, its record either way)
+UPLOAD_CHUNK_SIZE = 2 ** 20
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'upload_parts')
+CHUNKED_UPLOAD_EXPIRY = 60 * 60 * 24
 
 # DEFAULT_FILE_STORAGE = 'base.utils.CustomS3Boto3Storage'
 # STATICFILES_STORAGE = 'base.utils.StaticFileStorage'
@@ -0,0 +1,22 @@
+"""
+Settings for the test suite: python manage.py test --settings=online_job_portal.test_settings
+
+SQLite instead of MySQL, with a replica alias mirroring the primary so the routing (api.routers) is exercised
+against two connections.
+"""
+from online_job_portal.settings import *
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'test.sqlite3'),
+        # on disk rather than in memory: connections of concurrent threads then wait for each other's writes
+        # (ConcurrentApplyTests) instead of failing with "database table is locked"
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+    },
+}
+DATABASES['replica_0'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+DATABASE_REPLICAS = ['replica_0']
+
+# hashing at full strength makes every created user cost a fraction of a second
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -1,8 +1,6 @@
 from django.contrib import admin
-from django.urls import path
-from django.conf.urls.static import static
-from django.conf import settings
-from api import views
+from django.urls import path, re_path
+from api import api_views, media, syndication, views
 
 urlpatterns = [
                   path('admin/', admin.site.urls),
@@ -11,9 +9,22 @@ urlpatterns = [
                   path('signin/', views.CandidateSignInView.as_view(), name="signin"),
                   path('logout/', views.CandidateSignOutView.as_view(), name="logout"),
                   path('profile/', views.CandidateProfileView.as_view(), name="profile"),
+                  path('dashboard/', views.CandidateDashboardView.as_view(), name="dashboard"),
                   path('joblist/', views.JobPostListView.as_view(), name="joblist"),
                   path('jobdetail/<str:pk>/', views.JobPostDetailView.as_view(), name="jobdetail"),
                   path('applicationlist/', views.JobApplicationListView.as_view(), name="applicationlist"),
                   path('savelist/', views.JobSaveListView.as_view(), name="savelist"),
+                  path('savedsearches/', views.SavedSearchListView.as_view(), name="savedsearches"),
+                  path('jobs/bulk/', views.JobBulkActionView.as_view(), name="jobs_bulk"),
+                  path('api/v1/jobs/', api_views.JobPostListApiView.as_view(), name="api_joblist"),
+                  path('api/v1/jobs/<str:pk>/', api_views.JobPostDetailApiView.as_view(), name="api_jobdetail"),
+                  path('api/v1/autocomplete/<str:kind>/', api_views.AutocompleteApiView.as_view(),
+                       name="api_autocomplete"),
+                  path('api/v1/stats/hiring/', api_views.HiringStatsApiView.as_view(), name="api_hiring_stats"),
+                  path('api/v1/uploads/', api_views.UploadApiView.as_view(), name="api_uploads"),
+                  path('api/v1/uploads/<uuid:pk>/', api_views.UploadChunkApiView.as_view(), name="api_upload"),
+                  re_path(r'^media/(?P<path>.*)$', media.serve_media, name="media"),
+                  re_path(r'^(?P<path>sitemap\.xml|sitemaps/jobs-\d+\.xml|feeds/jobs(?:-\d+)?\.(?:rss|json))$',
+                          syndication.serve_syndication, name="syndication"),
 
-              ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+              ]
@@ -5,3 +5,18 @@ CITY_EXISTS = "A city with that name already exists"
 COMPANY_EXISTS = "A company with that name already exists"
 GENERIC_ERROR = 'An error occurred.please try again.'
 FAILED_LOGIN = 'Login failed with the provided credentials.'
+INVALID_BULK_ACTION = 'Unknown action, expected one of apply, unapply, save or unsave.'
+INVALID_JOB_POST = 'Invalid job post.'
+INVALID_SAVED_SEARCH = 'Invalid saved search.'
+INVALID_SEARCH_FILTERS = 'Invalid skill, city or company in the search filters.'
+SAVED_SEARCH_DEFAULT_NAME = 'My job alert'
+APPLICATIONS_TRANSITIONED = '{updated} application(s) moved to "{status}".'
+APPLICATIONS_SKIPPED = '{skipped} application(s) skipped: their status cannot move to "{status}".'
+JOB_POST_DUPLICATE = 'This job post looks like a near-duplicate of <a href="{url}">{original}</a>, it was flagged.'
+JOB_POSTS_MERGED = '{merged} duplicate job post(s) merged into their originals.'
+DUPLICATE_OF_ITSELF = 'A job post cannot be a duplicate of itself.'
+DUPLICATE_OF_DUPLICATE = 'That job post is itself a duplicate, pick its original instead.'
+UPLOAD_TOO_LARGE = 'The file is too large, the limit is {max_mb} MB.'
+UPLOAD_WRONG_TYPE = 'The file is not of an accepted type.'
+LOGIN_BUSY = 'We are receiving too many sign ins right now, please try again in a moment.'
+LOGIN_THROTTLED = 'Too many attempts, please try again in {retry_after} seconds.'